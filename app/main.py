@@ -1,5 +1,9 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 import os
 
@@ -7,21 +11,162 @@ import os
 load_dotenv()
 
 from app.routers import v1_router, v2_router
-from app.services import ollama_service, google_ai_service
+from app.services import ollama_service, google_ai_service, llm_cache, score_batcher
+
+# Static parts of the status payloads, built once instead of on every poll
+SERVICE_VERSION = "2.0.0"
+
+_ROOT_STATIC = {
+    "status": "ok",
+    "service": "llama",
+    "version": SERVICE_VERSION,
+}
+
+# Service is healthy if at least one provider is available
+_HEALTH_STATUS = {
+    (ollama_ok, google_ok): {
+        "status": "healthy" if (ollama_ok or google_ok) else "degraded",
+        "service": "llama",
+        "version": SERVICE_VERSION,
+        "ollama_available": ollama_ok,
+        "google_ai_available": google_ok,
+    }
+    for ollama_ok in (True, False)
+    for google_ok in (True, False)
+}
+
+_INFO_STATIC = {
+    "service": "Llama IELTS Scoring Service",
+    "version": SERVICE_VERSION,
+    "description": "IELTS speaking scoring using Ollama LLM and Google AI Studio",
+}
+
+_ENDPOINTS = {
+    "health": "GET /health",
+    "info": "GET /info",
+    "reconnect": "POST /reconnect",
+    # v1 endpoints (Ollama)
+    "v1_score": "POST /api/score (v1 - Ollama)",
+    "v1_score_batch": "POST /api/score/batch (v1 - Ollama)",
+    "v1_chat": "POST /api/chat (v1 - Ollama)",
+    "v1_generate_topics": "POST /api/generate/topics (v1 - Ollama)",
+    "v1_generate_questions": "POST /api/generate/questions (v1 - Ollama)",
+    "v1_generate_answers": "POST /api/generate/answers (v1 - Ollama)",
+    "v1_generate_structures": "POST /api/generate/structures (v1 - Ollama)",
+    "v1_generate_vocabulary": "POST /api/generate/vocabulary (v1 - Ollama)",
+    "v1_generate_batch": "POST /api/generate/{topics,questions,answers,structures,vocabulary}/batch (v1 - Ollama)",
+    "v1_generate": "POST /api/generate (v1 - Ollama, fallback/playground)",
+    "v1_grammar_correct": "POST /api/grammar/correct (v1 - Ollama)",
+    "v1_improve": "POST /api/improve (v1 - Ollama)",
+    "v2_score": "POST /api/v2/score ",
+    "v2_chat": "POST /api/v2/chat",
+    "v2_generate_topics": "POST /api/v2/generate/topics ",
+    "v2_generate_questions": "POST /api/v2/generate/questions ",
+    "v2_generate_answers": "POST /api/v2/generate/answers ",
+    "v2_generate_structures": "POST /api/v2/generate/structures ",
+    "v2_generate_vocabulary": "POST /api/v2/generate/vocabulary ",
+    "v2_generate": "POST /api/v2/generate ",
+    "v2_grammar_correct": "POST /api/v2/grammar/correct ",
+    "v2_improve": "POST /api/v2/improve ",
+    "v2_list_models": "GET /api/v2/models ",
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled Ollama client on startup, close it and background tasks on shutdown"""
+    # The client is created inside the running event loop and reused by every request
+    await ollama_service.reconnect()
+    ollama_service.start_health_checks()
+    yield
+    await score_batcher.close()
+    await ollama_service.close()
+
+
+app = FastAPI(
+    title="Llama Service",
+    version=SERVICE_VERSION,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+class _BodyTooLarge(Exception):
+    pass
 
-app = FastAPI(title="Llama Service", version="2.0.0")
+
+class BodySizeLimitMiddleware:
+    """Reject requests whose body exceeds max_bytes with 413
+    
+    Content-Length is checked up front; bodies without it (chunked) are counted
+    as they are received.
+    """
+    
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        too_large = ORJSONResponse({"detail": "Request body too large"}, status_code=413)
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if not value.isdigit() or int(value) > self.max_bytes:
+                    await too_large(scope, receive, send)
+                    return
+                break
+        
+        received = 0
+        exceeded = False
+        rejected = False
+        response_started = False
+        
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+        
+        async def limited_send(message):
+            nonlocal response_started, rejected
+            if exceeded:
+                # The app may turn the receive error into its own response (FastAPI
+                # answers 400 for body parse errors); replace it with the 413
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = rejected = True
+                    await too_large(scope, receive, send)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except _BodyTooLarge:
+            if rejected:
+                return
+            if response_started:
+                raise
+            await too_large(scope, receive, send)
+
+
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=int(os.getenv("MAX_BODY_BYTES", "262144")))
+
+# Compress larger JSON responses, generate output runs to several KB
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_BYTES", "1024")))
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://localhost:3001",
-        "http://127.0.0.1:3000",
-        "http://127.0.0.1:3001",
-    ],
+    allow_origin_regex=r"^http://(localhost|127\.0\.0\.1):(3000|3001)$",
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
 )
 
@@ -34,9 +179,7 @@ app.include_router(v2_router)
 async def root():
     """Root endpoint with service status"""
     return {
-        "status": "ok",
-        "service": "llama",
-        "version": "2.0.0",
+        **_ROOT_STATIC,
         "ollama_available": ollama_service.available,
         "ollama_url": ollama_service.base_url,
         "default_model": ollama_service.default_model,
@@ -49,25 +192,18 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    ollama_healthy = ollama_service.available
-    google_ai_healthy = google_ai_service.available
-    
-    # Service is healthy if at least one provider is available
-    overall_status = "healthy" if (ollama_healthy or google_ai_healthy) else "degraded"
-    
+    status = _HEALTH_STATUS[(ollama_service.available, google_ai_service.available)]
     return {
-        "status": overall_status,
-        "service": "llama",
-        "version": "2.0.0",
-        "ollama_available": ollama_healthy,
-        "google_ai_available": google_ai_healthy,
+        **status,
+        "llm_cache": llm_cache.stats(),
+        "ollama_limiter": ollama_service.limiter.stats(),
     }
 
 
 @app.post("/reconnect")
 async def reconnect():
     """Manually retry Ollama connection"""
-    success = ollama_service.reconnect()
+    success = await ollama_service.reconnect()
     return {
         "success": success,
         "ollama_available": ollama_service.available,
@@ -80,38 +216,25 @@ async def reconnect():
 async def info():
     """Get service information"""
     return {
-        "service": "Llama IELTS Scoring Service",
-        "version": "2.0.0",
-        "description": "IELTS speaking scoring using Ollama LLM and Google AI Studio",
+        **_INFO_STATIC,
         "ollama_available": ollama_service.available,
         "ollama_url": ollama_service.base_url,
         "default_model": ollama_service.default_model,
         "google_ai_available": google_ai_service.available,
-        "endpoints": {
-            "health": "GET /health",
-            "info": "GET /info",
-            "reconnect": "POST /reconnect",
-            # v1 endpoints (Ollama)
-            "v1_score": "POST /api/score (v1 - Ollama)",
-            "v1_chat": "POST /api/chat (v1 - Ollama)",
-            "v1_generate_topics": "POST /api/generate/topics (v1 - Ollama)",
-            "v1_generate_questions": "POST /api/generate/questions (v1 - Ollama)",
-            "v1_generate_answers": "POST /api/generate/answers (v1 - Ollama)",
-            "v1_generate_structures": "POST /api/generate/structures (v1 - Ollama)",
-            "v1_generate_vocabulary": "POST /api/generate/vocabulary (v1 - Ollama)",
-            "v1_generate": "POST /api/generate (v1 - Ollama, fallback/playground)",
-            "v1_grammar_correct": "POST /api/grammar/correct (v1 - Ollama)",
-            "v1_improve": "POST /api/improve (v1 - Ollama)",
-            "v2_score": "POST /api/v2/score ",
-            "v2_chat": "POST /api/v2/chat",
-            "v2_generate_topics": "POST /api/v2/generate/topics ",
-            "v2_generate_questions": "POST /api/v2/generate/questions ",
-            "v2_generate_answers": "POST /api/v2/generate/answers ",
-            "v2_generate_structures": "POST /api/v2/generate/structures ",
-            "v2_generate_vocabulary": "POST /api/v2/generate/vocabulary ",
-            "v2_generate": "POST /api/v2/generate ",
-            "v2_grammar_correct": "POST /api/v2/grammar/correct ",
-            "v2_improve": "POST /api/v2/improve ",
-            "v2_list_models": "GET /api/v2/models ",
-        }
+        "endpoints": _ENDPOINTS,
     }
+
+
+if __name__ == "__main__":
+    # Multi-worker run without gunicorn (e.g. on Windows): python -m app.main
+    # Each worker imports the app and opens its own Ollama client in lifespan
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "11434")),
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2)),
+        loop="auto",
+        http="auto",
+    )
@@ -2,6 +2,7 @@ from .schemas import (
     Message,
     ChatPayload,
     ScoreRequest,
+    ScoreResult,
     TopicsRequest,
     TopicsResponse,
     QuestionItem,
@@ -15,6 +16,13 @@ from .schemas import (
     VocabularyResponse,
     VocabularyItem,
     StructureItem,
+    ScoreBatchRequest,
+    TopicsBatchRequest,
+    QuestionsBatchRequest,
+    AnswersBatchRequest,
+    StructuresBatchRequest,
+    VocabularyBatchRequest,
+    BatchItemError,
     GenerateRequest,
     GrammarCorrectionRequest,
     GrammarCorrectionResponse,
@@ -26,6 +34,7 @@ __all__ = [
     "Message",
     "ChatPayload",
     "ScoreRequest",
+    "ScoreResult",
     "TopicsRequest",
     "TopicsResponse",
     "QuestionItem",
@@ -39,6 +48,13 @@ __all__ = [
     "VocabularyResponse",
     "VocabularyItem",
     "StructureItem",
+    "ScoreBatchRequest",
+    "TopicsBatchRequest",
+    "QuestionsBatchRequest",
+    "AnswersBatchRequest",
+    "StructuresBatchRequest",
+    "VocabularyBatchRequest",
+    "BatchItemError",
     "GenerateRequest",
     "GrammarCorrectionRequest",
     "GrammarCorrectionResponse",
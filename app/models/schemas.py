@@ -1,25 +1,59 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
 from typing import Optional, List
 
 
+# Size limits for free-text request fields, so one oversized request cannot
+# monopolise prompt building and the model
+MAX_TEXT_LENGTH = 20000      # transcriptions, custom prompts, chat messages
+MAX_QUESTION_LENGTH = 4000   # question / context text
+MAX_LABEL_LENGTH = 200       # topic, level, category and similar short labels
+MAX_GENERATE_COUNT = 50
+
+
 class Message(BaseModel):
-    role: str
-    content: str
+    role: str = Field(..., max_length=MAX_LABEL_LENGTH)
+    content: str = Field(..., max_length=MAX_TEXT_LENGTH)
 
 
 class ChatPayload(BaseModel):
-    model: str
-    messages: List[Message]
+    model: str = Field(..., max_length=MAX_LABEL_LENGTH)
+    messages: List[Message] = Field(..., max_length=50)
     format: Optional[dict] = None
 
 
 class ScoreRequest(BaseModel):
     """Request model for direct scoring endpoint"""
-    transcription: str
-    questionText: Optional[str] = None
-    topic: Optional[str] = "General"
-    level: Optional[str] = "intermediate"
-    includeGrammarCorrection: Optional[bool] = True  # Automatically include grammar correction when errors detected
+    model_config = ConfigDict(extra="ignore")
+
+    transcription: str = Field(..., max_length=MAX_TEXT_LENGTH)
+    questionText: str = Field("", max_length=MAX_QUESTION_LENGTH)
+    topic: str = Field("General", max_length=MAX_LABEL_LENGTH)
+    level: str = Field("intermediate", max_length=MAX_LABEL_LENGTH)
+    includeGrammarCorrection: bool = True  # Automatically include grammar correction when errors detected
+
+
+class ScoreResult(BaseModel):
+    """Scores parsed from a model answer, with defaults for missing fields"""
+    model_config = ConfigDict(extra="ignore")
+
+    bandScore: float = 6.5
+    pronunciationScore: float = 6.0
+    grammarScore: float = 6.5
+    vocabularyScore: float = 6.0
+    fluencyScore: float = 6.5
+    overallFeedback: Optional[str] = "Evaluation completed."
+
+    @field_validator(
+        "bandScore", "pronunciationScore", "grammarScore", "vocabularyScore", "fluencyScore",
+        mode="before"
+    )
+    @classmethod
+    def _clamp_band(cls, value, info: ValidationInfo):
+        """Coerce to float and clamp to the 0-9 band range; null means the default"""
+        if value is None:
+            return cls.model_fields[info.field_name].default
+        value = float(value)
+        return 9.0 if value > 9.0 else (0.0 if value < 0.0 else value)
 
 
 class QuestionItem(BaseModel):
@@ -30,11 +64,11 @@ class QuestionItem(BaseModel):
 
 class TopicsRequest(BaseModel):
     """Request model for topics generation"""
-    partNumber: Optional[int] = 1
-    difficultyLevel: Optional[str] = "intermediate"
-    count: Optional[int] = 5
-    topicCategory: Optional[str] = None
-    prompt: Optional[str] = None  # Optional custom prompt
+    partNumber: int = Field(1, ge=1, le=3)
+    difficultyLevel: str = Field("intermediate", max_length=MAX_LABEL_LENGTH)
+    count: int = Field(5, ge=1, le=MAX_GENERATE_COUNT)
+    topicCategory: Optional[str] = Field(None, max_length=MAX_LABEL_LENGTH)
+    prompt: Optional[str] = Field(None, max_length=MAX_TEXT_LENGTH)  # Optional custom prompt
 
 
 class TopicsResponse(BaseModel):
@@ -44,10 +78,10 @@ class TopicsResponse(BaseModel):
 
 class QuestionsRequest(BaseModel):
     """Request model for questions generation"""
-    partNumber: Optional[int] = 2
-    difficultyLevel: Optional[str] = "intermediate"
-    topic: Optional[str] = None
-    prompt: Optional[str] = None  # Optional custom prompt
+    partNumber: int = Field(2, ge=1, le=3)
+    difficultyLevel: str = Field("intermediate", max_length=MAX_LABEL_LENGTH)
+    topic: Optional[str] = Field(None, max_length=MAX_LABEL_LENGTH)
+    prompt: Optional[str] = Field(None, max_length=MAX_TEXT_LENGTH)  # Optional custom prompt
 
 
 class VocabularyItem(BaseModel):
@@ -75,9 +109,9 @@ class QuestionsResponse(BaseModel):
 
 class AnswersRequest(BaseModel):
     """Request model for answers generation"""
-    question: str
-    partNumber: Optional[int] = 2
-    targetBand: Optional[float] = 7.0
+    question: str = Field(..., max_length=MAX_QUESTION_LENGTH)
+    partNumber: int = Field(2, ge=1, le=3)
+    targetBand: float = Field(7.0, ge=0, le=9)
 
 
 class AnswersResponse(BaseModel):
@@ -90,10 +124,10 @@ class AnswersResponse(BaseModel):
 
 class StructuresRequest(BaseModel):
     """Request model for structures generation"""
-    question: str
-    partNumber: Optional[int] = 3
-    targetBand: Optional[float] = 7.0
-    count: Optional[int] = 5
+    question: str = Field(..., max_length=MAX_QUESTION_LENGTH)
+    partNumber: int = Field(3, ge=1, le=3)
+    targetBand: float = Field(7.0, ge=0, le=9)
+    count: int = Field(5, ge=1, le=MAX_GENERATE_COUNT)
 
 
 class StructuresResponse(BaseModel):
@@ -103,9 +137,9 @@ class StructuresResponse(BaseModel):
 
 class VocabularyRequest(BaseModel):
     """Request model for vocabulary generation"""
-    question: str
-    targetBand: Optional[float] = 7.0
-    count: Optional[int] = 10
+    question: str = Field(..., max_length=MAX_QUESTION_LENGTH)
+    targetBand: float = Field(7.0, ge=0, le=9)
+    count: int = Field(10, ge=1, le=MAX_GENERATE_COUNT)
 
 
 class VocabularyResponse(BaseModel):
@@ -113,18 +147,60 @@ class VocabularyResponse(BaseModel):
     vocabulary: List[VocabularyItem]
 
 
+# Upper bound on items per /generate/*/batch call; the items still share the
+# OLLAMA_INFLIGHT limit, a batch only saves the HTTP round trips
+MAX_BATCH_ITEMS = 20
+
+
+class ScoreBatchRequest(BaseModel):
+    """Request model for batched scoring"""
+    items: List[ScoreRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class TopicsBatchRequest(BaseModel):
+    """Request model for batched topics generation"""
+    items: List[TopicsRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class QuestionsBatchRequest(BaseModel):
+    """Request model for batched questions generation"""
+    items: List[QuestionsRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class AnswersBatchRequest(BaseModel):
+    """Request model for batched answers generation"""
+    items: List[AnswersRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class StructuresBatchRequest(BaseModel):
+    """Request model for batched structures generation"""
+    items: List[StructuresRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class VocabularyBatchRequest(BaseModel):
+    """Request model for batched vocabulary generation"""
+    items: List[VocabularyRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class BatchItemError(BaseModel):
+    """Error entry returned in place of a failed batch item"""
+    error: str
+    statusCode: int
+
+
 class GenerateRequest(BaseModel):
     """Request model for text generation endpoint (fallback/playground)"""
-    prompt: str
+    prompt: str = Field(..., max_length=MAX_TEXT_LENGTH)
     task_type: Optional[str] = "general"  # topics, questions, outline, vocabulary, structures, refine, compare
     context: Optional[dict] = None
     format: Optional[dict] = None
+    stream: bool = False  # v1 only: stream the raw generation as NDJSON
 
 
 class GrammarCorrectionRequest(BaseModel):
     """Request model for grammar correction"""
-    transcription: str
-    textQuestion: Optional[str] = None
+    transcription: str = Field(..., max_length=MAX_TEXT_LENGTH)
+    textQuestion: Optional[str] = Field(None, max_length=MAX_QUESTION_LENGTH)
     language: Optional[str] = "en"  # Language code, default to English
 
 
@@ -138,8 +214,8 @@ class GrammarCorrectionResponse(BaseModel):
 
 class ImproveRequest(BaseModel):
     """Request model for sentence improvement"""
-    transcription: str
-    questionText: Optional[str] = None
+    transcription: str = Field(..., max_length=MAX_TEXT_LENGTH)
+    questionText: Optional[str] = Field(None, max_length=MAX_QUESTION_LENGTH)
     language: Optional[str] = "en"  # Language code, default to English
 
 
@@ -1,7 +1,19 @@
 """API v1 routes using Ollama"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple, Type, Union
+
+import orjson
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from app.models import (
     ScoreRequest,
+    ScoreResult,
     ChatPayload,
     TopicsRequest,
     TopicsResponse,
@@ -13,166 +25,172 @@ from app.models import (
     StructuresResponse,
     VocabularyRequest,
     VocabularyResponse,
+    VocabularyItem,
+    ScoreBatchRequest,
+    TopicsBatchRequest,
+    QuestionsBatchRequest,
+    AnswersBatchRequest,
+    StructuresBatchRequest,
+    VocabularyBatchRequest,
+    BatchItemError,
+    StructureItem,
     GenerateRequest,
     GrammarCorrectionRequest,
     GrammarCorrectionResponse,
     ImproveRequest,
     ImproveResponse,
 )
-from app.services import ollama_service
-from app.utils import build_ielts_prompt, extract_json_from_response
+from app.services import ollama_service, score_batcher
+from app.utils import SCORE_SYSTEM_MSG, build_ielts_prompt
 from app.utils.json_extractor import extract_json_from_generate_response
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api", tags=["v1"])
 
 
-@router.post("/score")
-async def score(request: ScoreRequest):
+def _estimate_tokens(text: str) -> int:
+    """Rough token count: ~1.3 tokens per word, and at least one per 4 characters"""
+    return max(len(text.split()) * 4 // 3, len(text) // 4)
+
+
+async def _run_batch(handler, items):
+    """
+    Run a generate handler for every item concurrently
+
+    Items that fail are returned as BatchItemError entries so one bad
+    generation does not discard the rest of the batch.
+    """
+    results = await asyncio.gather(*(handler(item) for item in items), return_exceptions=True)
+    output = []
+    for result in results:
+        if isinstance(result, HTTPException):
+            output.append(BatchItemError(error=str(result.detail), statusCode=result.status_code))
+        elif isinstance(result, Exception):
+            output.append(BatchItemError(error=str(result), statusCode=500))
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            output.append(result)
+    return output
+
+
+async def _ndjson_stream(first: Optional[str], pieces):
+    """Encode generated pieces as Ollama-style NDJSON lines, ending with a done line"""
+    if first is not None:
+        yield orjson.dumps({"response": first, "done": False}) + b"\n"
+    try:
+        async for piece in pieces:
+            yield orjson.dumps({"response": piece, "done": False}) + b"\n"
+    except HTTPException as e:
+        # Headers are already sent, report the failure in-band
+        yield orjson.dumps({"error": e.detail, "done": True}) + b"\n"
+        return
+    yield orjson.dumps({"response": "", "done": True}) + b"\n"
+
+
+async def _score_messages(messages: List[Dict[str, str]], model: Optional[str], no_cache: bool) -> ScoreResult:
+    """Run a scoring chat and validate its scores"""
+    # Extract JSON, set defaults and clamp scores to valid range
+    return ScoreResult.model_validate(await score_batcher.score(messages, model=model, refresh=no_cache))
+
+
+async def _score_impl(
+    transcription: str,
+    question_text: str,
+    topic: str,
+    level: str,
+    model: Optional[str] = None,
+    no_cache: bool = False
+) -> ScoreResult:
+    """Score a transcription with the IELTS prompt; shared by /score and /chat"""
+    prompt = build_ielts_prompt(transcription, question_text, topic, level)
+    
+    if score_batcher.enabled and model is None and not no_cache:
+        # Concurrent scoring requests are coalesced into one Ollama call
+        return ScoreResult.model_validate(await score_batcher.submit(prompt))
+    
+    return await _score_messages([SCORE_SYSTEM_MSG, {"role": "user", "content": prompt}], model, no_cache)
+
+
+@router.post("/score", response_model=ScoreResult)
+async def score(request: ScoreRequest, no_cache: bool = False):
     """
     Score IELTS speaking response directly (v1 - Ollama)
     
     Simplified endpoint that takes transcription, topic, and level directly.
+    `?no_cache=1` re-scores instead of returning a cached result.
     """
     try:
-        # Build IELTS-specific prompt
-        prompt = build_ielts_prompt(
+        return await _score_impl(
             request.transcription,
-            request.questionText or "",
-            request.topic or "General",
-            request.level or "intermediate"
-        )
-        
-        messages = [
-            {"role": "system", "content": "You are an expert IELTS speaking examiner. Always return valid JSON only."},
-            {"role": "user", "content": prompt}
-        ]
-        
-        # Call Ollama
-        response_text = ollama_service.chat(
-            messages=messages,
-            temperature=0.3,
-            num_predict=500
+            request.questionText,
+            request.topic,
+            request.level,
+            no_cache=no_cache
         )
         
-        # Extract JSON from response
-        result = extract_json_from_response(response_text)
-        
-        # Validate and set defaults
-        band_score = float(result.get("bandScore", 6.5))
-        pronunciation_score = float(result.get("pronunciationScore", 6.0))
-        grammar_score = float(result.get("grammarScore", 6.5))
-        vocabulary_score = float(result.get("vocabularyScore", 6.0))
-        fluency_score = float(result.get("fluencyScore", 6.5))
-        overall_feedback = result.get("overallFeedback", "Evaluation completed.")
-        
-        # Clamp scores to valid range
-        def clamp_score(score):
-            return max(0.0, min(9.0, float(score)))
-        
-        return {
-            "bandScore": clamp_score(band_score),
-            "pronunciationScore": clamp_score(pronunciation_score),
-            "grammarScore": clamp_score(grammar_score),
-            "vocabularyScore": clamp_score(vocabulary_score),
-            "fluencyScore": clamp_score(fluency_score),
-            "overallFeedback": overall_feedback
-        }
-        
     except HTTPException:
         raise
     except Exception as e:
+        logger.exception("score failure")
         raise HTTPException(
             status_code=500,
-            detail=f"Error processing scoring request: {str(e)}"
-        )
+            detail=f"Error processing scoring request: {e}"
+        ) from e
+
+
+# BatchItemError comes first: every ScoreResult field has a default, so an
+# error entry would also validate as a ScoreResult full of default scores
+@router.post("/score/batch", response_model=List[Union[BatchItemError, ScoreResult]])
+async def score_batch(request: ScoreBatchRequest):
+    """
+    Score several IELTS speaking responses concurrently (v1 - Ollama)
+    
+    Returns one ScoreResult per item, in order; failed items are returned as
+    {"error", "statusCode"} entries.
+    """
+    return await _run_batch(score, request.items)
 
 
-@router.post("/chat")
-async def chat(payload: ChatPayload):
+@router.post("/chat", response_model=ScoreResult)
+async def chat(payload: ChatPayload, no_cache: bool = False):
     """
     Score IELTS speaking response using Ollama LLM (v1)
     """
     try:
-        # Extract transcription, topic, and level from messages
-        user_message = None
-        system_message = None
+        # Last message of each role wins, as with a sequential scan
+        by_role = {msg.role: msg.content for msg in payload.messages}
+        user_message = by_role.get("user")
+        system_message = by_role.get("system")
         
-        for msg in payload.messages:
-            if msg.role == "user":
-                user_message = msg.content
-            elif msg.role == "system":
-                system_message = msg.content
+        model = payload.model or None
         
         # If no explicit prompt, build one from transcription
         if not system_message or "IELTS" not in system_message:
-            # Try to extract transcription from user message
-            transcription = user_message or ""
-            topic = "General"
-            level = "intermediate"
-            
-            # Build IELTS-specific prompt
-            prompt = build_ielts_prompt(transcription, "", topic, level)
-            messages = [
-                {"role": "system", "content": "You are an expert IELTS speaking examiner. Always return valid JSON only."},
-                {"role": "user", "content": prompt}
-            ]
-        else:
-            # Use provided messages
-            messages = [{"role": msg.role, "content": msg.content} for msg in payload.messages]
-        
-        # Call Ollama
-        model = payload.model or None
-        response_text = ollama_service.chat(
-            messages=messages,
-            model=model,
-            temperature=0.3,
-            num_predict=500
-        )
+            return await _score_impl(user_message or "", "", "General", "intermediate", model, no_cache)
         
-        # Extract JSON from response
-        result = extract_json_from_response(response_text)
-        
-        # Validate and set defaults
-        band_score = float(result.get("bandScore", 6.5))
-        pronunciation_score = float(result.get("pronunciationScore", 6.0))
-        grammar_score = float(result.get("grammarScore", 6.5))
-        vocabulary_score = float(result.get("vocabularyScore", 6.0))
-        fluency_score = float(result.get("fluencyScore", 6.5))
-        overall_feedback = result.get("overallFeedback", "Evaluation completed.")
-        
-        # Clamp scores to valid range
-        def clamp_score(score):
-            return max(0.0, min(9.0, float(score)))
-        
-        return {
-            "bandScore": clamp_score(band_score),
-            "pronunciationScore": clamp_score(pronunciation_score),
-            "grammarScore": clamp_score(grammar_score),
-            "vocabularyScore": clamp_score(vocabulary_score),
-            "fluencyScore": clamp_score(fluency_score),
-            "overallFeedback": overall_feedback
-        }
+        # Use provided messages
+        provided = [{"role": msg.role, "content": msg.content} for msg in payload.messages]
+        return await _score_messages(provided, model, no_cache)
         
     except HTTPException:
         raise
     except Exception as e:
+        logger.exception("chat failure")
         raise HTTPException(
             status_code=500,
-            detail=f"Error processing request: {str(e)}"
-        )
+            detail=f"Error processing request: {e}"
+        ) from e
 
 
-@router.post("/generate/topics", response_model=TopicsResponse)
-async def generate_topics(request: TopicsRequest):
-    """Generate IELTS Speaking topics with related questions (v1 - Ollama)"""
-    try:
-        # Build prompt
-        if request.prompt:
-            user_prompt = request.prompt
-        else:
-            user_prompt = f"""Generate {request.count or 5} IELTS Speaking Part {request.partNumber or 1} topics about {request.topicCategory or 'daily life and hobbies'}.
+# Prompt scaffolding for the /generate/* endpoints; only the request fields are
+# substituted per call. Request fields go in a trailing Parameters block so every
+# prompt of an endpoint shares the same prefix, which Ollama reuses from its KV cache
+_TOPICS_SYSTEM = "You are an expert IELTS content creator. Generate IELTS speaking topics in JSON format."
+
+_TOPICS_PROMPT_TMPL = """Generate IELTS Speaking topics using the parameters listed at the end.
 Each topic should have 3-4 related questions.
-Difficulty level: {request.difficultyLevel or 'intermediate'}
 
 Return JSON in this exact format:
 {{
@@ -182,52 +200,23 @@ Return JSON in this exact format:
             "questions": ["Question 1", "Question 2", "Question 3"]
         }}
     ]
-}}"""
-        
-        system_message = "You are an expert IELTS content creator. Generate IELTS speaking topics in JSON format."
-        
-        response_text = ollama_service.generate(
-            system_message=system_message,
-            user_prompt=user_prompt,
-            temperature=0.7,
-            num_predict=1500
-        )
-        
-        result = extract_json_from_generate_response(response_text)
-        
-        # Validate and return
-        if "topics" not in result:
-            raise HTTPException(status_code=500, detail="Invalid response format: missing 'topics' field")
-        
-        return TopicsResponse(**result)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating topics: {str(e)}"
-        )
+}}
 
+Parameters:
+- Number of topics: {count}
+- IELTS Speaking Part: {part}
+- Topic category: {category}
+- Difficulty level: {difficulty}"""
 
-@router.post("/generate/questions", response_model=QuestionsResponse)
-async def generate_questions(request: QuestionsRequest):
-    """Generate IELTS Speaking questions with sample answers, vocabulary, and structures (v1 - Ollama)"""
-    try:
-        # Build prompt
-        if request.prompt:
-            user_prompt = request.prompt
-        else:
-            topic_part = f" about '{request.topic}'" if request.topic else ""
-            user_prompt = f"""Generate an IELTS Speaking Part {request.partNumber or 2} cue card{topic_part}.
+_QUESTIONS_SYSTEM = "You are an expert IELTS content creator. Generate IELTS speaking questions with sample answers, vocabulary, and structures in JSON format."
+
+_QUESTIONS_PROMPT_TMPL = """Generate an IELTS Speaking cue card using the parameters listed at the end.
 Include:
 1. The question/prompt
 2. A sample answer (2-3 minutes speaking time)
 3. Key vocabulary with definitions, examples, and pronunciation
 4. Useful sentence structures with examples
 
-Difficulty level: {request.difficultyLevel or 'intermediate'}
-
 Return JSON in this exact format:
 {{
     "question": "The cue card question/prompt",
@@ -247,47 +236,19 @@ Return JSON in this exact format:
             "usage": "when to use this structure"
         }}
     ]
-}}"""
-        
-        system_message = "You are an expert IELTS content creator. Generate IELTS speaking questions with sample answers, vocabulary, and structures in JSON format."
-        
-        response_text = ollama_service.generate(
-            system_message=system_message,
-            user_prompt=user_prompt,
-            temperature=0.7,
-            num_predict=2500
-        )
-        
-        result = extract_json_from_generate_response(response_text)
-        
-        # Validate and return
-        required_fields = ["question", "sampleAnswer", "vocabulary", "structures"]
-        for field in required_fields:
-            if field not in result:
-                raise HTTPException(status_code=500, detail=f"Invalid response format: missing '{field}' field")
-        
-        return QuestionsResponse(**result)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating questions: {str(e)}"
-        )
+}}
 
+Parameters:
+- IELTS Speaking Part: {part}
+- Topic: {topic}
+- Difficulty level: {difficulty}"""
 
-@router.post("/generate/answers", response_model=AnswersResponse)
-async def generate_answers(request: AnswersRequest):
-    """Generate sample answers for IELTS Speaking questions (v1 - Ollama)"""
-    try:
-        # Build prompt
-        user_prompt = f"""Generate a sample answer for this IELTS Speaking Part {request.partNumber or 2} question:
+_ANSWERS_SYSTEM = "You are an expert IELTS speaking coach. Generate high-quality sample answers with vocabulary and structures in JSON format."
 
-Question: {request.question}
+_ANSWERS_PROMPT_TMPL = """Generate a sample answer for the IELTS Speaking question given at the end.
 
 Requirements:
-- Target band score: {request.targetBand or 7.0}
+- Aim for the target band score listed in the parameters
 - Answer should be suitable for 2-3 minutes of speaking
 - Include advanced vocabulary and complex structures appropriate for the target band
 - Provide key vocabulary with definitions, examples, and pronunciation
@@ -319,59 +280,20 @@ Return JSON in this exact format (use these exact field names):
         }}
     ],
     "keyPoints": ["Key point 1", "Key point 2", "Key point 3"]
-}}"""
-        
-        system_message = "You are an expert IELTS speaking coach. Generate high-quality sample answers with vocabulary and structures in JSON format."
-        
-        response_text = ollama_service.generate(
-            system_message=system_message,
-            user_prompt=user_prompt,
-            temperature=0.7,
-            num_predict=2500
-        )
-        
-        result = extract_json_from_generate_response(response_text)
-        
-        # Handle alternative field names (LLM might use different names)
-        if "sampleAnswer" in result and "answer" not in result:
-            result["answer"] = result["sampleAnswer"]
-        if "sample_answer" in result and "answer" not in result:
-            result["answer"] = result["sample_answer"]
-        
-        # Validate and return
-        required_fields = ["answer", "vocabulary", "structures"]
-        missing_fields = [field for field in required_fields if field not in result]
-        
-        if missing_fields:
-            returned_fields = list(result.keys())
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Invalid response format: missing fields {missing_fields}. Returned fields: {returned_fields}. Response preview: {str(result)[:500]}"
-            )
-        
-        return AnswersResponse(**result)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating answers: {str(e)}"
-        )
+}}
 
+Parameters:
+- IELTS Speaking Part: {part}
+- Target band score: {target_band}
 
-@router.post("/generate/structures", response_model=StructuresResponse)
-async def generate_structures(request: StructuresRequest):
-    """Generate useful sentence structures for IELTS Speaking (v1 - Ollama)"""
-    try:
-        # Build prompt
-        user_prompt = f"""Generate {request.count or 5} useful sentence structures for answering this IELTS Speaking Part {request.partNumber or 3} question:
+Question: {question}"""
+
+_STRUCTURES_SYSTEM = "You are an expert English teacher. Generate sample sentence structures and patterns in JSON format."
 
-Question: {request.question}
+_STRUCTURES_PROMPT_TMPL = """Generate useful sentence structures for answering the IELTS Speaking question given at the end.
 
 Requirements:
-- Target band score: {request.targetBand or 7.0}
-- Structures should be appropriate for the target band level
+- Structures should be appropriate for the target band score listed in the parameters
 - Each structure should be relevant to answering the question
 
 Each structure should include:
@@ -388,46 +310,21 @@ Return JSON in this exact format:
             "usage": "explanation of when and how to use this structure"
         }}
     ]
-}}"""
-        
-        system_message = "You are an expert English teacher. Generate sample sentence structures and patterns in JSON format."
-        
-        response_text = ollama_service.generate(
-            system_message=system_message,
-            user_prompt=user_prompt,
-            temperature=0.7,
-            num_predict=1500
-        )
-        
-        result = extract_json_from_generate_response(response_text)
-        
-        # Validate and return
-        if "structures" not in result:
-            raise HTTPException(status_code=500, detail="Invalid response format: missing 'structures' field")
-        
-        return StructuresResponse(**result)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating structures: {str(e)}"
-        )
+}}
 
+Parameters:
+- Number of structures: {count}
+- IELTS Speaking Part: {part}
+- Target band score: {target_band}
 
-@router.post("/generate/vocabulary", response_model=VocabularyResponse)
-async def generate_vocabulary(request: VocabularyRequest):
-    """Generate vocabulary lists with definitions, examples, and pronunciation (v1 - Ollama)"""
-    try:
-        # Build prompt
-        user_prompt = f"""Generate a vocabulary list of {request.count or 10} words relevant to answering this IELTS Speaking question:
+Question: {question}"""
+
+_VOCABULARY_SYSTEM = "You are an expert English teacher. Generate vocabulary lists with definitions, examples, and pronunciation in JSON format."
 
-Question: {request.question}
+_VOCABULARY_PROMPT_TMPL = """Generate a vocabulary list relevant to answering the IELTS Speaking question given at the end.
 
 Requirements:
-- Target band score: {request.targetBand or 7.0}
-- Vocabulary should be appropriate for the target band level
+- Vocabulary should be appropriate for the target band score listed in the parameters
 - Words should be relevant and useful for answering the question
 
 For each word, provide:
@@ -446,34 +343,343 @@ Return JSON in this exact format:
             "pronunciation": "/pronunciation in IPA/"
         }}
     ]
-}}"""
-        
-        system_message = "You are an expert English teacher. Generate vocabulary lists with definitions, examples, and pronunciation in JSON format."
-        
-        response_text = ollama_service.generate(
-            system_message=system_message,
+}}
+
+Parameters:
+- Number of words: {count}
+- Target band score: {target_band}
+
+Question: {question}"""
+
+# /grammar/correct and /improve embed the transcription mid-prompt, so these are
+# plain format templates rather than prefix-first ones
+_GRAMMAR_SYSTEM = "You are an expert English grammar teacher. Correct grammar errors and improve sentences while maintaining the original meaning. Return ONLY valid JSON format."
+
+_GRAMMAR_PROMPT_TMPL = """Correct the grammar and improve the following sentence in {language}:
+
+Sentence to correct: {transcription}{question_context}
+
+Requirements:
+1. Fix all grammatical errors
+2. Improve sentence structure if needed
+3. Maintain the original meaning
+4. Keep the same style and tone
+5. If the sentence is already correct, return it as is
+
+Return JSON in this exact format:
+{{
+    "original": "the original sentence",
+    "corrected": "the corrected sentence",
+    "corrections": [
+        {{
+            "original": "incorrect word/phrase",
+            "corrected": "correct word/phrase",
+            "reason": "brief explanation of the correction"
+        }}
+    ],
+    "explanation": "Brief explanation of the main corrections made"
+}}
+
+IMPORTANT: 
+- Return ONLY valid JSON, no additional text
+- If no corrections are needed, return the original sentence as corrected
+- The corrections array should list all significant corrections made"""
+
+_GRAMMAR_REQUIRED = frozenset({"corrected"})
+
+_IMPROVE_SYSTEM = "You are an expert IELTS speaking coach. Improve FULL transcriptions by fixing grammar, correcting mispronunciations, using advanced vocabulary, and improving structure. You MUST process the ENTIRE transcription, not just parts of it. Return ONLY valid JSON format."
+
+_IMPROVE_PROMPT_TMPL = """Improve the following FULL transcription for IELTS Speaking in {language}:
+
+FULL ORIGINAL TRANSCRIPTION (you must improve ALL of it):
+{transcription}{question_context}
+
+CRITICAL REQUIREMENTS:
+1. You MUST improve the ENTIRE transcription, not just a part of it
+2. Fix ALL grammatical errors throughout the entire text
+3. Correct ALL mispronounced words and transcription errors (e.g., "pretty table" -> "predictable", "off-new up tee" -> "often I have tea")
+4. Use more advanced and appropriate vocabulary where suitable
+5. Improve sentence structure and make it more natural
+6. Maintain the original meaning and context
+7. Make it sound more fluent and native-like
+8. Keep the same length and structure - improve the ENTIRE text
+
+IMPORTANT: The transcription may contain many errors and mispronunciations. You must process and improve EVERY part of it, not just a small portion.
+
+Return JSON in this exact format:
+{{
+    "original": "the FULL original transcription",
+    "improved": "the FULL improved transcription",
+    "improvements": [
+        {{
+            "type": "grammar|vocabulary|structure|fluency|transcription",
+            "original": "original word/phrase",
+            "improved": "improved word/phrase",
+            "reason": "brief explanation"
+        }}
+    ],
+    "explanation": "Brief explanation of the main improvements made",
+    "vocabularySuggestions": [
+        {{
+            "word": "advanced word",
+            "definition": "definition",
+            "example": "example sentence",
+            "pronunciation": "/pronunciation/"
+        }}
+    ],
+    "structureSuggestions": [
+        {{
+            "pattern": "sentence pattern",
+            "example": "example using the pattern",
+            "usage": "when to use"
+        }}
+    ]
+}}
+
+IMPORTANT: 
+- Return ONLY valid JSON, no additional text
+- The "original" field MUST contain the FULL original transcription
+- The "improved" field MUST contain the FULL improved transcription
+- Include vocabulary and structure suggestions that would help improve the sentence
+- The improvements array should list all significant changes made"""
+
+_IMPROVE_REQUIRED = frozenset({"improved"})
+
+# System messages for the /generate playground, by task type (read-only)
+_SYSTEM_MESSAGES: Mapping[str, str] = MappingProxyType({
+    "topics": _TOPICS_SYSTEM,
+    "questions": _QUESTIONS_SYSTEM,
+    "outline": "You are an expert IELTS speaking coach. Generate speaking outlines and structures in JSON format.",
+    "vocabulary": _VOCABULARY_SYSTEM,
+    "structures": _STRUCTURES_SYSTEM,
+    "refine": "You are an expert IELTS speaking coach. Refine and improve speaking responses while preserving the original style.",
+    "compare": "You are an expert IELTS speaking coach. Compare two versions of text and highlight improvements.",
+    "general": "You are a helpful AI assistant. Generate content in the requested format."
+})
+
+
+def _num_predict(name: str, default: int) -> int:
+    """Token budget for a generate endpoint, overridable with OLLAMA_NUM_PREDICT_<NAME>"""
+    return int(os.getenv(f"OLLAMA_NUM_PREDICT_{name.upper()}", str(default)))
+
+@dataclass(frozen=True)
+class _EndpointSpec:
+    """Everything that differs between the structured /generate/* endpoints"""
+    name: str
+    system: str
+    template: str
+    response_model: Type[BaseModel]
+    # Template fields for a request, with defaults applied
+    fields: Callable[[Any], Dict[str, Any]]
+    required: FrozenSet[str]
+    num_predict: int
+    # (alternative name, field) pairs the model sometimes uses instead of a field
+    aliases: Tuple[Tuple[str, str], ...] = ()
+    # Output schema passed as Ollama's format, built once from the response model
+    format_schema: Dict[str, Any] = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "format_schema", self.response_model.model_json_schema())
+
+
+_SPECS = {
+    "topics": _EndpointSpec(
+        name="topics",
+        system=_TOPICS_SYSTEM,
+        template=_TOPICS_PROMPT_TMPL,
+        response_model=TopicsResponse,
+        fields=lambda request: {
+            "count": request.count,
+            "part": request.partNumber,
+            "category": request.topicCategory or 'daily life and hobbies',
+            "difficulty": request.difficultyLevel,
+        },
+        required=frozenset({"topics"}),
+        num_predict=_num_predict("topics", 1500),
+    ),
+    "questions": _EndpointSpec(
+        name="questions",
+        system=_QUESTIONS_SYSTEM,
+        template=_QUESTIONS_PROMPT_TMPL,
+        response_model=QuestionsResponse,
+        fields=lambda request: {
+            "part": request.partNumber,
+            "topic": request.topic or "any",
+            "difficulty": request.difficultyLevel,
+        },
+        required=frozenset({"question", "sampleAnswer", "vocabulary", "structures"}),
+        num_predict=_num_predict("questions", 2500),
+    ),
+    "answers": _EndpointSpec(
+        name="answers",
+        system=_ANSWERS_SYSTEM,
+        template=_ANSWERS_PROMPT_TMPL,
+        response_model=AnswersResponse,
+        fields=lambda request: {
+            "part": request.partNumber,
+            "question": request.question,
+            "target_band": request.targetBand,
+        },
+        required=frozenset({"answer", "vocabulary", "structures"}),
+        num_predict=_num_predict("answers", 2500),
+        aliases=(("sampleAnswer", "answer"), ("sample_answer", "answer")),
+    ),
+    "structures": _EndpointSpec(
+        name="structures",
+        system=_STRUCTURES_SYSTEM,
+        template=_STRUCTURES_PROMPT_TMPL,
+        response_model=StructuresResponse,
+        fields=lambda request: {
+            "count": request.count,
+            "part": request.partNumber,
+            "question": request.question,
+            "target_band": request.targetBand,
+        },
+        required=frozenset({"structures"}),
+        num_predict=_num_predict("structures", 1500),
+    ),
+    "vocabulary": _EndpointSpec(
+        name="vocabulary",
+        system=_VOCABULARY_SYSTEM,
+        template=_VOCABULARY_PROMPT_TMPL,
+        response_model=VocabularyResponse,
+        fields=lambda request: {
+            "count": request.count,
+            "question": request.question,
+            "target_band": request.targetBand,
+        },
+        required=frozenset({"vocabulary"}),
+        num_predict=_num_predict("vocabulary", 2000),
+    ),
+}
+
+
+@lru_cache(maxsize=256)
+def _render_prompt(template: str, fields: Tuple[Tuple[str, Any], ...]) -> str:
+    """Fill a prompt template; repeated parameter combinations reuse the same string"""
+    return template.format(**dict(fields))
+
+
+async def _dispatch(
+    spec: _EndpointSpec,
+    request,
+    custom_prompt: Optional[str] = None,
+    no_cache: bool = False
+) -> BaseModel:
+    """Build the prompt, call Ollama and turn the JSON answer into the endpoint's response"""
+    try:
+        # Prompt assembly stays inline on the event loop: it takes microseconds, far
+        # less than a thread-pool hop. Only the Ollama call below should await.
+        user_prompt = custom_prompt or _render_prompt(spec.template, tuple(spec.fields(request).items()))
+        
+        # Field-built prompts repeat a lot and are served from the LLM cache;
+        # free-form custom prompts always go to the model. JSON mode makes the
+        # answer a single object, so generation can stop once it is closed
+        response_text = await ollama_service.generate(
+            system_message=spec.system,
             user_prompt=user_prompt,
             temperature=0.7,
-            num_predict=2000
+            num_predict=spec.num_predict,
+            cache=not custom_prompt,
+            format=spec.format_schema,
+            stop_at_json=True,
+            refresh=no_cache
         )
         
         result = extract_json_from_generate_response(response_text)
         
+        # Handle alternative field names (LLM might use different names)
+        for alias, name in spec.aliases:
+            if alias in result and name not in result:
+                result[name] = result[alias]
+        
         # Validate and return
-        if "vocabulary" not in result:
-            raise HTTPException(status_code=500, detail="Invalid response format: missing 'vocabulary' field")
+        missing = spec.required - result.keys()
+        if missing:
+            missing_fields = sorted(missing)
+            returned_fields = list(result.keys())
+            raise HTTPException(
+                status_code=500,
+                detail=f"Invalid response format: missing fields {missing_fields}. Returned fields: {returned_fields}. Response preview: {str(result)[:500]}"
+            )
         
-        return VocabularyResponse(**result)
+        # LLM output is untrusted, so the whole answer is validated against the response model
+        return spec.response_model.model_validate(result)
         
     except HTTPException:
         raise
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Invalid response format: {e.error_count()} invalid field(s). Response preview: {str(result)[:500]}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error generating vocabulary: {str(e)}"
+            detail=f"Error generating {spec.name}: {str(e)}"
         )
 
 
+@router.post("/generate/topics", response_model=TopicsResponse)
+async def generate_topics(request: TopicsRequest, no_cache: bool = False):
+    """Generate IELTS Speaking topics with related questions (v1 - Ollama)"""
+    return await _dispatch(_SPECS["topics"], request, request.prompt, no_cache=no_cache)
+
+
+@router.post("/generate/questions", response_model=QuestionsResponse)
+async def generate_questions(request: QuestionsRequest, no_cache: bool = False):
+    """Generate IELTS Speaking questions with sample answers, vocabulary, and structures (v1 - Ollama)"""
+    return await _dispatch(_SPECS["questions"], request, request.prompt, no_cache=no_cache)
+
+
+@router.post("/generate/answers", response_model=AnswersResponse)
+async def generate_answers(request: AnswersRequest, no_cache: bool = False):
+    """Generate sample answers for IELTS Speaking questions (v1 - Ollama)"""
+    return await _dispatch(_SPECS["answers"], request, no_cache=no_cache)
+
+
+@router.post("/generate/structures", response_model=StructuresResponse)
+async def generate_structures(request: StructuresRequest, no_cache: bool = False):
+    """Generate useful sentence structures for IELTS Speaking (v1 - Ollama)"""
+    return await _dispatch(_SPECS["structures"], request, no_cache=no_cache)
+
+
+@router.post("/generate/vocabulary", response_model=VocabularyResponse)
+async def generate_vocabulary(request: VocabularyRequest, no_cache: bool = False):
+    """Generate vocabulary lists with definitions, examples, and pronunciation (v1 - Ollama)"""
+    return await _dispatch(_SPECS["vocabulary"], request, no_cache=no_cache)
+
+
+@router.post("/generate/topics/batch", response_model=List[Union[TopicsResponse, BatchItemError]])
+async def generate_topics_batch(request: TopicsBatchRequest):
+    """Generate several topic sets concurrently (v1 - Ollama)"""
+    return await _run_batch(generate_topics, request.items)
+
+
+@router.post("/generate/questions/batch", response_model=List[Union[QuestionsResponse, BatchItemError]])
+async def generate_questions_batch(request: QuestionsBatchRequest):
+    """Generate several cue cards concurrently (v1 - Ollama)"""
+    return await _run_batch(generate_questions, request.items)
+
+
+@router.post("/generate/answers/batch", response_model=List[Union[AnswersResponse, BatchItemError]])
+async def generate_answers_batch(request: AnswersBatchRequest):
+    """Generate sample answers for several questions concurrently (v1 - Ollama)"""
+    return await _run_batch(generate_answers, request.items)
+
+
+@router.post("/generate/structures/batch", response_model=List[Union[StructuresResponse, BatchItemError]])
+async def generate_structures_batch(request: StructuresBatchRequest):
+    """Generate sentence structures for several questions concurrently (v1 - Ollama)"""
+    return await _run_batch(generate_structures, request.items)
+
+
+@router.post("/generate/vocabulary/batch", response_model=List[Union[VocabularyResponse, BatchItemError]])
+async def generate_vocabulary_batch(request: VocabularyBatchRequest):
+    """Generate vocabulary lists for several questions concurrently (v1 - Ollama)"""
+    return await _run_batch(generate_vocabulary, request.items)
+
+
 @router.post("/generate")
 async def generate(request: GenerateRequest):
     """
@@ -484,18 +690,7 @@ async def generate(request: GenerateRequest):
     """
     try:
         # Build system message based on task type
-        system_messages = {
-            "topics": "You are an expert IELTS content creator. Generate IELTS speaking topics in JSON format.",
-            "questions": "You are an expert IELTS content creator. Generate IELTS speaking questions with sample answers, vocabulary, and structures in JSON format.",
-            "outline": "You are an expert IELTS speaking coach. Generate speaking outlines and structures in JSON format.",
-            "vocabulary": "You are an expert English teacher. Generate vocabulary lists with definitions, examples, and pronunciation in JSON format.",
-            "structures": "You are an expert English teacher. Generate sample sentence structures and patterns in JSON format.",
-            "refine": "You are an expert IELTS speaking coach. Refine and improve speaking responses while preserving the original style.",
-            "compare": "You are an expert IELTS speaking coach. Compare two versions of text and highlight improvements.",
-            "general": "You are a helpful AI assistant. Generate content in the requested format."
-        }
-        
-        system_message = system_messages.get(request.task_type, system_messages["general"])
+        system_message = _SYSTEM_MESSAGES.get(request.task_type, _SYSTEM_MESSAGES["general"])
         
         # Add context to prompt if provided
         user_prompt = request.prompt
@@ -503,7 +698,24 @@ async def generate(request: GenerateRequest):
             context_str = ", ".join([f"{k}: {v}" for k, v in request.context.items()])
             user_prompt = f"{user_prompt}\n\nContext: {context_str}"
         
-        response_text = ollama_service.generate(
+        if request.stream:
+            pieces = ollama_service.stream_generate(
+                system_message=system_message,
+                user_prompt=user_prompt,
+                temperature=0.7,
+                num_predict=2000
+            )
+            # Wait for the first piece here so connection and model errors are still HTTP errors
+            first = await anext(pieces, None)
+            # An explicit encoding makes GZipMiddleware pass the stream through
+            # instead of buffering lines inside the gzip stream
+            return StreamingResponse(
+                _ndjson_stream(first, pieces),
+                media_type="application/x-ndjson",
+                headers={"Content-Encoding": "identity"}
+            )
+        
+        response_text = await ollama_service.generate(
             system_message=system_message,
             user_prompt=user_prompt,
             temperature=0.7,
@@ -524,7 +736,7 @@ async def generate(request: GenerateRequest):
 
 
 @router.post("/grammar/correct", response_model=GrammarCorrectionResponse)
-async def correct_grammar(request: GrammarCorrectionRequest):
+async def correct_grammar(request: GrammarCorrectionRequest, no_cache: bool = False):
     """
     Correct grammar for a transcription (v1 - Ollama)
     
@@ -559,68 +771,47 @@ async def correct_grammar(request: GrammarCorrectionRequest):
         if request.textQuestion:
             question_context = f"\n\nContext/Question: {request.textQuestion}"
         
-        user_prompt = f"""Correct the grammar and improve the following sentence in {request.language or 'English'}:
-
-Sentence to correct: {request.transcription}{question_context}
-
-Requirements:
-1. Fix all grammatical errors
-2. Improve sentence structure if needed
-3. Maintain the original meaning
-4. Keep the same style and tone
-5. If the sentence is already correct, return it as is
-
-Return JSON in this exact format:
-{{
-    "original": "the original sentence",
-    "corrected": "the corrected sentence",
-    "corrections": [
-        {{
-            "original": "incorrect word/phrase",
-            "corrected": "correct word/phrase",
-            "reason": "brief explanation of the correction"
-        }}
-    ],
-    "explanation": "Brief explanation of the main corrections made"
-}}
-
-IMPORTANT: 
-- Return ONLY valid JSON, no additional text
-- If no corrections are needed, return the original sentence as corrected
-- The corrections array should list all significant corrections made"""
+        user_prompt = _GRAMMAR_PROMPT_TMPL.format(
+            language=request.language or 'English',
+            transcription=request.transcription,
+            question_context=question_context
+        )
         
-        system_message = "You are an expert English grammar teacher. Correct grammar errors and improve sentences while maintaining the original meaning. Return ONLY valid JSON format."
         
-        response_text = ollama_service.generate(
-            system_message=system_message,
+        response_text = await ollama_service.generate(
+            system_message=_GRAMMAR_SYSTEM,
             user_prompt=user_prompt,
             temperature=0.3,
-            num_predict=1500
+            num_predict=1500,
+            refresh=no_cache
         )
         
         result = extract_json_from_generate_response(response_text)
         
-        # Validate required fields
-        required_fields = ["original", "corrected"]
-        missing_fields = [field for field in required_fields if field not in result]
+        # The original text is known here, only the model's rewrite is required
+        if not isinstance(result.get("original"), str):
+            result["original"] = request.transcription
         
-        if missing_fields:
+        # Validate required fields
+        missing = _GRAMMAR_REQUIRED - result.keys()
+        if missing:
+            missing_fields = sorted(missing)
             returned_fields = list(result.keys())
             raise HTTPException(
                 status_code=500,
                 detail=f"Invalid response format: missing fields {missing_fields}. Returned fields: {returned_fields}"
             )
         
-        # Ensure original and corrected are set
-        if "original" not in result:
-            result["original"] = request.transcription
-        if "corrected" not in result:
-            result["corrected"] = request.transcription
-        
-        return GrammarCorrectionResponse(**result)
+        # LLM output is untrusted, so the answer is validated against the response model
+        return GrammarCorrectionResponse.model_validate(result)
         
     except HTTPException:
         raise
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Invalid response format: {e.error_count()} invalid field(s). Returned fields: {list(result.keys())}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -629,7 +820,7 @@ IMPORTANT:
 
 
 @router.post("/improve", response_model=ImproveResponse)
-async def improve_sentence(request: ImproveRequest):
+async def improve_sentence(request: ImproveRequest, no_cache: bool = False):
     """
     Improve a sentence for IELTS Speaking (v1 - Ollama)
     
@@ -666,96 +857,59 @@ async def improve_sentence(request: ImproveRequest):
         if request.questionText:
             question_context = f"\n\nQuestion/Context: {request.questionText}"
         
-        user_prompt = f"""Improve the following FULL transcription for IELTS Speaking in {request.language or 'English'}:
-
-FULL ORIGINAL TRANSCRIPTION (you must improve ALL of it):
-{request.transcription}{question_context}
-
-CRITICAL REQUIREMENTS:
-1. You MUST improve the ENTIRE transcription, not just a part of it
-2. Fix ALL grammatical errors throughout the entire text
-3. Correct ALL mispronounced words and transcription errors (e.g., "pretty table" -> "predictable", "off-new up tee" -> "often I have tea")
-4. Use more advanced and appropriate vocabulary where suitable
-5. Improve sentence structure and make it more natural
-6. Maintain the original meaning and context
-7. Make it sound more fluent and native-like
-8. Keep the same length and structure - improve the ENTIRE text
-
-IMPORTANT: The transcription may contain many errors and mispronunciations. You must process and improve EVERY part of it, not just a small portion.
-
-Return JSON in this exact format:
-{{
-    "original": "the FULL original transcription",
-    "improved": "the FULL improved transcription",
-    "improvements": [
-        {{
-            "type": "grammar|vocabulary|structure|fluency|transcription",
-            "original": "original word/phrase",
-            "improved": "improved word/phrase",
-            "reason": "brief explanation"
-        }}
-    ],
-    "explanation": "Brief explanation of the main improvements made",
-    "vocabularySuggestions": [
-        {{
-            "word": "advanced word",
-            "definition": "definition",
-            "example": "example sentence",
-            "pronunciation": "/pronunciation/"
-        }}
-    ],
-    "structureSuggestions": [
-        {{
-            "pattern": "sentence pattern",
-            "example": "example using the pattern",
-            "usage": "when to use"
-        }}
-    ]
-}}
-
-IMPORTANT: 
-- Return ONLY valid JSON, no additional text
-- The "original" field MUST contain the FULL original transcription
-- The "improved" field MUST contain the FULL improved transcription
-- Include vocabulary and structure suggestions that would help improve the sentence
-- The improvements array should list all significant changes made"""
+        user_prompt = _IMPROVE_PROMPT_TMPL.format(
+            language=request.language or 'English',
+            transcription=request.transcription,
+            question_context=question_context
+        )
         
-        system_message = "You are an expert IELTS speaking coach. Improve FULL transcriptions by fixing grammar, correcting mispronunciations, using advanced vocabulary, and improving structure. You MUST process the ENTIRE transcription, not just parts of it. Return ONLY valid JSON format."
         
-        # Estimate tokens needed for long transcriptions
-        input_length = len(request.transcription)
-        estimated_tokens = max(2500, int(input_length * 1.5) + 1000)
+        # The answer repeats the transcription twice (original + improved) plus
+        # the suggestion lists, so budget ~3x its tokens on top of a fixed part
+        estimated_tokens = max(1500, _estimate_tokens(request.transcription) * 3 + 800)
         
-        response_text = ollama_service.generate(
-            system_message=system_message,
+        response_text = await ollama_service.generate(
+            system_message=_IMPROVE_SYSTEM,
             user_prompt=user_prompt,
             temperature=0.3,
-            num_predict=min(estimated_tokens, 8000)  # Cap at reasonable limit
+            num_predict=min(estimated_tokens, 8000),  # Cap at reasonable limit
+            format="json",
+            stop_at_json=True,
+            refresh=no_cache
         )
         
+        # An answer shorter than half the transcription cannot hold an improved
+        # version that passes the length check below, so skip parsing it
+        original_length = len(request.transcription)
+        if original_length > 100 and len(response_text) < original_length * 0.5:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Response appears incomplete. Original length: {original_length} chars, Response length: {len(response_text)} chars. The improved text should be similar length to the original."
+            )
+        
         result = extract_json_from_generate_response(response_text)
         
-        # Validate required fields
-        required_fields = ["original", "improved"]
-        missing_fields = [field for field in required_fields if field not in result]
+        # The original text is known here, only the model's rewrite is required
+        if not isinstance(result.get("original"), str):
+            result["original"] = request.transcription
         
-        if missing_fields:
+        # Validate required fields
+        missing = _IMPROVE_REQUIRED - result.keys()
+        if missing:
+            missing_fields = sorted(missing)
             returned_fields = list(result.keys())
             raise HTTPException(
                 status_code=500,
                 detail=f"Invalid response format: missing fields {missing_fields}. Returned fields: {returned_fields}"
             )
         
-        # Ensure original and improved are set
-        if "original" not in result:
-            result["original"] = request.transcription
-        if "improved" not in result:
-            result["improved"] = request.transcription
+        # LLM output is untrusted, so the answer is validated against the response model
+        response = ImproveResponse.model_validate(result)
         
         # Validate that improved text is reasonable length (at least 50% of original)
         # This helps catch cases where only a small portion was processed
-        original_length = len(result.get("original", ""))
-        improved_length = len(result.get("improved", ""))
+        original_length = len(response.original)
+        improved_length = len(response.improved)
         
         if original_length > 100 and improved_length < original_length * 0.5:
             # Improved text is too short - likely only processed a portion
@@ -764,10 +918,15 @@ IMPORTANT:
                 detail=f"Response appears incomplete. Original length: {original_length} chars, Improved length: {improved_length} chars. The improved text should be similar length to the original."
             )
         
-        return ImproveResponse(**result)
+        return response
         
     except HTTPException:
         raise
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Invalid response format: {e.error_count()} invalid field(s). Returned fields: {list(result.keys())}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1,7 +1,16 @@
 """API v2 routes sử dụng Google AI Studio"""
-from fastapi import APIRouter, HTTPException
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import List, Mapping, Optional
+
+import orjson
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import ValidationError
+from fastapi.responses import StreamingResponse
 from app.models import (
     ScoreRequest,
+    ScoreResult,
     ChatPayload,
     TopicsRequest,
     TopicsResponse,
@@ -11,6 +20,7 @@ from app.models import (
     AnswersResponse,
     StructuresRequest,
     StructuresResponse,
+    VocabularyItem,
     VocabularyRequest,
     VocabularyResponse,
     GenerateRequest,
@@ -20,11 +30,25 @@ from app.models import (
     ImproveResponse,
 )
 from app.services import google_ai_service
-from app.utils import build_ielts_prompt, extract_json_from_response
+from app.utils import SCORE_SYSTEM_MSG, build_ielts_prompt, extract_json_from_response
 from app.utils.json_extractor import extract_json_from_generate_response
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/v2", tags=["v2"])
 
+# System message cho /generate theo loại task, tạo một lần khi import (read-only)
+_SYSTEM_MESSAGES: Mapping[str, str] = MappingProxyType({
+    "topics": "You are an expert IELTS content creator. Generate IELTS speaking topics in JSON format.",
+    "questions": "You are an expert IELTS content creator. Generate IELTS speaking questions with sample answers, vocabulary, and structures in JSON format.",
+    "outline": "You are an expert IELTS speaking coach. Generate speaking outlines and structures in JSON format.",
+    "vocabulary": "You are an expert English teacher. Generate vocabulary lists with definitions, examples, and pronunciation in JSON format.",
+    "structures": "You are an expert English teacher. Generate sample sentence structures and patterns in JSON format.",
+    "refine": "You are an expert IELTS speaking coach. Refine and improve speaking responses while preserving the original style.",
+    "compare": "You are an expert IELTS speaking coach. Compare two versions of text and highlight improvements.",
+    "general": "You are a helpful AI assistant. Generate content in the requested format."
+})
+
 
 @router.post("/score")
 async def score(request: ScoreRequest):
@@ -38,68 +62,56 @@ async def score(request: ScoreRequest):
         # Xây dựng prompt chuyên biệt cho IELTS
         prompt = build_ielts_prompt(
             request.transcription,
-            request.questionText or "",
-            request.topic or "General",
-            request.level or "intermediate"
+            request.questionText,
+            request.topic,
+            request.level
         )
         
-        messages = [
-            {"role": "system", "content": "You are an expert IELTS speaking examiner. Always return valid JSON only."},
-            {"role": "user", "content": prompt}
-        ]
+        messages = [SCORE_SYSTEM_MSG, {"role": "user", "content": prompt}]
         
         # Gọi Google AI
-        response_text = google_ai_service.chat(
+        scoring_call = google_ai_service.chat(
             messages=messages,
             temperature=0.3,
             max_output_tokens=2048
         )
         
-        # Trích xuất JSON từ response
-        result = extract_json_from_response(response_text)
-        
-        # Xác thực và đặt giá trị mặc định
-        band_score = float(result.get("bandScore", 6.5))
-        pronunciation_score = float(result.get("pronunciationScore", 6.0))
-        grammar_score = float(result.get("grammarScore", 6.5))
-        vocabulary_score = float(result.get("vocabularyScore", 6.0))
-        fluency_score = float(result.get("fluencyScore", 6.5))
-        overall_feedback = result.get("overallFeedback", "Evaluation completed.")
-        
-        # Giới hạn điểm số trong khoảng hợp lệ
-        def clamp_score(score):
-            return max(0.0, min(9.0, float(score)))
-        
-        clamped_grammar_score = clamp_score(grammar_score)
-        
-        # Chuẩn bị response
-        response = {
-            "bandScore": clamp_score(band_score),
-            "pronunciationScore": clamp_score(pronunciation_score),
-            "grammarScore": clamped_grammar_score,
-            "vocabularyScore": clamp_score(vocabulary_score),
-            "fluencyScore": clamp_score(fluency_score),
-            "overallFeedback": overall_feedback
-        }
-        
         # Tự động bao gồm sửa ngữ pháp nếu được yêu cầu
         # Mặc định là True - luôn bao gồm sửa ngữ pháp để giúp người dùng cải thiện
-        should_include_grammar = request.includeGrammarCorrection if request.includeGrammarCorrection is not None else True
+        should_include_grammar = request.includeGrammarCorrection
+        
+        if should_include_grammar:
+            # Gọi sửa ngữ pháp nội bộ
+            grammar_request = GrammarCorrectionRequest(
+                transcription=request.transcription,
+                textQuestion=request.questionText,
+                language="en"
+            )
+            
+            # Hai call độc lập với nhau nên chạy song song; lỗi sửa ngữ pháp
+            # được trả về như giá trị để xử lý riêng bên dưới
+            response_text, grammar_result = await asyncio.gather(
+                scoring_call,
+                correct_grammar(grammar_request),
+                return_exceptions=True
+            )
+            if isinstance(response_text, BaseException):
+                raise response_text
+        else:
+            response_text = await scoring_call
+        
+        # Trích xuất JSON, đặt giá trị mặc định và giới hạn điểm số trong khoảng hợp lệ
+        response = ScoreResult.model_validate(extract_json_from_response(response_text)).model_dump()
         
         # Luôn bao gồm sửa ngữ pháp khi should_include_grammar là True (hành vi mặc định)
         # Điều này đảm bảo người dùng luôn nhận được sửa ngữ pháp khi có lỗi, giúp họ học hỏi
         if should_include_grammar:
-            try:
-                # Gọi sửa ngữ pháp nội bộ
-                grammar_request = GrammarCorrectionRequest(
-                    transcription=request.transcription,
-                    textQuestion=request.questionText,
-                    language="en"
-                )
-                
-                # Gọi hàm sửa ngữ pháp
-                grammar_result = await correct_grammar(grammar_request)
-                
+            if isinstance(grammar_result, BaseException):
+                # Nếu sửa ngữ pháp thất bại, ghi log nhưng không làm thất bại toàn bộ request
+                # Chỉ bao gồm null cho sửa ngữ pháp
+                response["grammarCorrection"] = None
+                response["correctedTranscription"] = None
+            else:
                 # Thêm sửa ngữ pháp vào response
                 response["grammarCorrection"] = {
                     "original": grammar_result.original,
@@ -108,11 +120,6 @@ async def score(request: ScoreRequest):
                     "explanation": grammar_result.explanation
                 }
                 response["correctedTranscription"] = grammar_result.corrected
-            except Exception as grammar_error:
-                # Nếu sửa ngữ pháp thất bại, ghi log nhưng không làm thất bại toàn bộ request
-                # Chỉ bao gồm null cho sửa ngữ pháp
-                response["grammarCorrection"] = None
-                response["correctedTranscription"] = None
         else:
             # Không cần hoặc không yêu cầu sửa ngữ pháp
             response["grammarCorrection"] = None
@@ -129,7 +136,7 @@ async def score(request: ScoreRequest):
         )
 
 
-@router.post("/chat")
+@router.post("/chat", response_model=ScoreResult)
 async def chat(payload: ChatPayload):
     """
     Chấm điểm phản hồi IELTS speaking sử dụng Google AI Studio (v2)
@@ -154,46 +161,22 @@ async def chat(payload: ChatPayload):
             
             # Xây dựng prompt chuyên biệt cho IELTS
             prompt = build_ielts_prompt(transcription, "", topic, level)
-            messages = [
-                {"role": "system", "content": "You are an expert IELTS speaking examiner. Always return valid JSON only."},
-                {"role": "user", "content": prompt}
-            ]
+            messages = [SCORE_SYSTEM_MSG, {"role": "user", "content": prompt}]
         else:
             # Sử dụng messages được cung cấp
             messages = [{"role": msg.role, "content": msg.content} for msg in payload.messages]
         
         # Gọi Google AI
         model = payload.model or None
-        response_text = google_ai_service.chat(
+        response_text = await google_ai_service.chat(
             messages=messages,
             model=model,
             temperature=0.3,
             max_output_tokens=2048
         )
         
-        # Trích xuất JSON từ response
-        result = extract_json_from_response(response_text)
-        
-        # Xác thực và đặt giá trị mặc định
-        band_score = float(result.get("bandScore", 6.5))
-        pronunciation_score = float(result.get("pronunciationScore", 6.0))
-        grammar_score = float(result.get("grammarScore", 6.5))
-        vocabulary_score = float(result.get("vocabularyScore", 6.0))
-        fluency_score = float(result.get("fluencyScore", 6.5))
-        overall_feedback = result.get("overallFeedback", "Evaluation completed.")
-        
-        # Giới hạn điểm số trong khoảng hợp lệ
-        def clamp_score(score):
-            return max(0.0, min(9.0, float(score)))
-        
-        return {
-            "bandScore": clamp_score(band_score),
-            "pronunciationScore": clamp_score(pronunciation_score),
-            "grammarScore": clamp_score(grammar_score),
-            "vocabularyScore": clamp_score(vocabulary_score),
-            "fluencyScore": clamp_score(fluency_score),
-            "overallFeedback": overall_feedback
-        }
+        # Trích xuất JSON, đặt giá trị mặc định và giới hạn điểm số trong khoảng hợp lệ
+        return ScoreResult.model_validate(extract_json_from_response(response_text))
         
     except HTTPException:
         raise
@@ -212,9 +195,9 @@ async def generate_topics(request: TopicsRequest):
         if request.prompt:
             user_prompt = request.prompt
         else:
-            user_prompt = f"""Generate {request.count or 5} IELTS Speaking Part {request.partNumber or 1} topics about {request.topicCategory or 'daily life and hobbies'}.
+            user_prompt = f"""Generate {request.count} IELTS Speaking Part {request.partNumber} topics about {request.topicCategory or 'daily life and hobbies'}.
 Each topic should have 3-4 related questions.
-Difficulty level: {request.difficultyLevel or 'intermediate'}
+Difficulty level: {request.difficultyLevel}
 
 Return JSON in this exact format:
 {{
@@ -228,7 +211,7 @@ Return JSON in this exact format:
         
         system_message = "You are an expert IELTS content creator. Generate IELTS speaking topics in JSON format."
         
-        response_text = google_ai_service.generate(
+        response_text = await google_ai_service.generate(
             system_message=system_message,
             user_prompt=user_prompt,
             temperature=0.7,
@@ -261,14 +244,14 @@ async def generate_questions(request: QuestionsRequest):
             user_prompt = request.prompt
         else:
             topic_part = f" about '{request.topic}'" if request.topic else ""
-            user_prompt = f"""Generate an IELTS Speaking Part {request.partNumber or 2} cue card{topic_part}.
+            user_prompt = f"""Generate an IELTS Speaking Part {request.partNumber} cue card{topic_part}.
 Include:
 1. The question/prompt
 2. A sample answer (2-3 minutes speaking time)
 3. Key vocabulary with definitions, examples, and pronunciation
 4. Useful sentence structures with examples
 
-Difficulty level: {request.difficultyLevel or 'intermediate'}
+Difficulty level: {request.difficultyLevel}
 
 Return JSON in this exact format:
 {{
@@ -293,7 +276,7 @@ Return JSON in this exact format:
         
         system_message = "You are an expert IELTS content creator. Generate IELTS speaking questions with sample answers, vocabulary, and structures in JSON format."
         
-        response_text = google_ai_service.generate(
+        response_text = await google_ai_service.generate(
             system_message=system_message,
             user_prompt=user_prompt,
             temperature=0.7,
@@ -324,12 +307,12 @@ async def generate_answers(request: AnswersRequest):
     """Tạo câu trả lời mẫu cho câu hỏi IELTS Speaking (v2 - Google AI Studio)"""
     try:
         # Xây dựng prompt
-        user_prompt = f"""Generate a concise sample answer for this IELTS Speaking Part {request.partNumber or 2} question:
+        user_prompt = f"""Generate a concise sample answer for this IELTS Speaking Part {request.partNumber} question:
 
 Question: {request.question}
 
 Requirements:
-- Target band score: {request.targetBand or 7.0}
+- Target band score: {request.targetBand}
 - Answer should be SHORT and CONCISE (about 30-60 seconds of speaking, NOT 2-3 minutes)
 - Include advanced vocabulary and complex structures appropriate for the target band
 - Keep the answer natural, fluent, and to the point
@@ -350,7 +333,7 @@ IMPORTANT:
         
         system_message = "You are an expert IELTS speaking coach. Generate concise, high-quality sample answers. You MUST return ONLY a JSON object with a single 'answer' field containing a SHORT answer text. Do not include any other fields. Keep answers brief and focused."
         
-        response_text = google_ai_service.generate(
+        response_text = await google_ai_service.generate(
             system_message=system_message,
             user_prompt=user_prompt,
             temperature=0.7,
@@ -428,12 +411,12 @@ async def generate_structures(request: StructuresRequest):
     """Tạo cấu trúc câu hữu ích cho IELTS Speaking (v2 - Google AI Studio)"""
     try:
         # Xây dựng prompt
-        user_prompt = f"""Generate {request.count or 5} useful sentence structures for answering this IELTS Speaking Part {request.partNumber or 3} question:
+        user_prompt = f"""Generate {request.count} useful sentence structures for answering this IELTS Speaking Part {request.partNumber} question:
 
 Question: {request.question}
 
 Requirements:
-- Target band score: {request.targetBand or 7.0}
+- Target band score: {request.targetBand}
 - Structures should be appropriate for the target band level
 - Each structure should be relevant to answering the question
 
@@ -455,7 +438,7 @@ Return JSON in this exact format:
         
         system_message = "You are an expert English teacher. Generate sample sentence structures and patterns in JSON format."
         
-        response_text = google_ai_service.generate(
+        response_text = await google_ai_service.generate(
             system_message=system_message,
             user_prompt=user_prompt,
             temperature=0.7,
@@ -479,22 +462,135 @@ Return JSON in this exact format:
         )
 
 
+def _to_vocabulary_response(result) -> VocabularyResponse:
+    """Chuẩn hoá JSON từ vựng Google AI trả về thành VocabularyResponse"""
+    # Xử lý trường hợp Google AI trả về vocabulary items trực tiếp thay vì bọc trong mảng "vocabulary"
+    if "vocabulary" not in result:
+        # Kiểm tra xem result có các field vocabulary item không (word, definition, example, pronunciation)
+        if all(key in result for key in ["word", "definition", "example"]):
+            # Một vocabulary item được trả về, bọc nó trong mảng
+            result = {"vocabulary": [result]}
+        # Kiểm tra xem result có phải là danh sách vocabulary items không
+        elif isinstance(result, list) and len(result) > 0 and isinstance(result[0], dict):
+            # Kiểm tra xem item đầu tiên có các field vocabulary không
+            if all(key in result[0] for key in ["word", "definition", "example"]):
+                result = {"vocabulary": result}
+            else:
+                # Cung cấp thông báo lỗi hữu ích hơn
+                returned_fields = list(result[0].keys()) if result else []
+                response_preview = str(result)[:1000] if len(str(result)) > 1000 else str(result)
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"Invalid response format: missing 'vocabulary' field. Returned fields: {returned_fields}. Response preview: {response_preview}"
+                )
+        else:
+            # Cung cấp thông báo lỗi hữu ích hơn
+            returned_fields = list(result.keys()) if isinstance(result, dict) else []
+            response_preview = str(result)[:1000] if len(str(result)) > 1000 else str(result)
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Invalid response format: missing 'vocabulary' field. Returned fields: {returned_fields}. Response preview: {response_preview}"
+            )
+    
+    # Thiếu items thì vẫn trả về những gì đã có
+    return VocabularyResponse(**result)
+
+
+async def _top_up_vocabulary(
+    request: VocabularyRequest,
+    existing: List[VocabularyItem],
+    missing_count: int
+) -> Optional[List[VocabularyItem]]:
+    """Sinh thêm missing_count items khác với các từ đã có; None nếu call bổ sung thất bại"""
+    existing_words = ", ".join(item.word for item in existing)
+    exclusion = f"\nThe new items MUST be different from these existing items: {existing_words}\n" if existing_words else ""
+    user_prompt = f"""You are generating additional vocabulary items for IELTS Speaking preparation.
+
+Question: {request.question}
+Target Band Score: {request.targetBand}
+Required Number of New Vocabulary Items: {missing_count}
+{exclusion}
+For EACH item, provide:
+- word: The vocabulary item (word, phrase, or idiom)
+- definition: Clear definition
+- example: Example sentence related to the question
+- pronunciation: IPA pronunciation guide
+
+Return a JSON object with a "vocabulary" array containing EXACTLY {missing_count} items."""
+    system_message = f"You are an expert IELTS English teacher. Your task is to generate EXACTLY {missing_count} vocabulary items in JSON format. Return ONLY valid JSON, no explanations, no additional text before or after the JSON."
+    
+    try:
+        response_text = await google_ai_service.generate(
+            system_message=system_message,
+            user_prompt=user_prompt,
+            temperature=0.5,
+            max_output_tokens=min(max(1024, missing_count * 200), 8192)
+        )
+        extra = _to_vocabulary_response(extract_json_from_generate_response(response_text)).vocabulary
+    except (HTTPException, ValidationError):
+        # Call lỗi hoặc response không parse/validate được, giữ danh sách đang có
+        return None
+    
+    # Bỏ các từ model lặp lại dù đã được yêu cầu khác đi
+    seen = {item.word.casefold() for item in existing}
+    unique = []
+    for item in extra:
+        key = item.word.casefold()
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique[:missing_count]
+
+
+def _sse_event(event: str, data) -> bytes:
+    """Mã hoá một Server-Sent Event; orjson không sinh xuống dòng nên data nằm trên một dòng"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+async def _vocabulary_sse(first: Optional[str], pieces):
+    """Chuyển tiếp text của model dạng event "chunk", kết thúc bằng event "result" đã parse"""
+    parts = []
+    try:
+        if first is not None:
+            parts.append(first)
+            yield _sse_event("chunk", {"text": first})
+        async for piece in pieces:
+            parts.append(piece)
+            yield _sse_event("chunk", {"text": piece})
+        
+        # Parse một lần khi model đã trả xong
+        result = _to_vocabulary_response(extract_json_from_generate_response("".join(parts)))
+    except HTTPException as e:
+        # Header đã được gửi, báo lỗi trong stream
+        yield _sse_event("error", {"detail": e.detail, "statusCode": e.status_code})
+        return
+    except Exception as e:
+        yield _sse_event("error", {"detail": f"Error generating vocabulary: {str(e)}", "statusCode": 500})
+        return
+    yield _sse_event("result", result.model_dump())
+
+
 @router.post("/generate/vocabulary", response_model=VocabularyResponse)
-async def generate_vocabulary(request: VocabularyRequest):
-    """Tạo danh sách từ vựng kèm định nghĩa, ví dụ, và phát âm (v2 - Google AI Studio)"""
+async def generate_vocabulary(request: VocabularyRequest, accept: Optional[str] = Header(None)):
+    """
+    Tạo danh sách từ vựng kèm định nghĩa, ví dụ, và phát âm (v2 - Google AI Studio)
+    
+    Gửi `Accept: text/event-stream` để nhận text dưới dạng SSE ngay khi model sinh ra
+    (event "chunk"), kết thúc bằng event "result" chứa VocabularyResponse.
+    """
     try:
         # Xây dựng prompt
-        vocabulary_count = request.count or 10
+        vocabulary_count = request.count
         user_prompt = f"""You are generating a vocabulary list for IELTS Speaking preparation.
 
 Question: {request.question}
-Target Band Score: {request.targetBand or 7.0}
+Target Band Score: {request.targetBand}
 Required Number of Vocabulary Items: {vocabulary_count}
 
 CRITICAL REQUIREMENTS:
 1. You MUST generate EXACTLY {vocabulary_count} vocabulary items - no more, no less.
 2. Each item must be relevant to answering the question.
-3. Vocabulary should be appropriate for band {request.targetBand or 7.0} level.
+3. Vocabulary should be appropriate for band {request.targetBand} level.
 4. Include a mix of single words, phrases, and idioms.
 
 For EACH of the {vocabulary_count} items, provide:
@@ -532,75 +628,49 @@ REMEMBER: The vocabulary array MUST contain EXACTLY {vocabulary_count} items. Co
         # Ước tính: ~200 tokens mỗi vocabulary item
         estimated_tokens = max(2048, vocabulary_count * 200)
         
-        # Sử dụng temperature thấp hơn để output nhất quán và có cấu trúc hơn
-        # Thử lại tối đa 2 lần nếu không có đủ items
-        max_retries = 2
-        for attempt in range(max_retries + 1):
-            response_text = google_ai_service.generate(
+        if accept and "text/event-stream" in accept:
+            # Không retry khi stream vì text đã được gửi cho client
+            pieces = google_ai_service.stream_generate(
                 system_message=system_message,
                 user_prompt=user_prompt,
-                temperature=0.3 if attempt == 0 else 0.5,  # Temperature thấp hơn cho lần thử đầu tiên
-                max_output_tokens=min(estimated_tokens, 8192)  # Giới hạn ở 8192 (tối đa cho một số models)
+                temperature=0.3,
+                max_output_tokens=min(estimated_tokens, 8192)
             )
-            
-            result = extract_json_from_generate_response(response_text)
-            
-            # Kiểm tra xem đã có đủ items chưa
-            if "vocabulary" in result and isinstance(result["vocabulary"], list):
-                actual_count = len(result["vocabulary"])
-                if actual_count >= vocabulary_count:
-                    break  # Đã có đủ items, thoát vòng lặp retry
-                elif attempt < max_retries:
-                    # Chưa đủ items, thử lại với prompt đã điều chỉnh
-                    user_prompt = f"""{user_prompt}
-
-IMPORTANT: The previous response only had {actual_count} items, but you need to generate EXACTLY {vocabulary_count} items. Please try again and ensure you generate all {vocabulary_count} vocabulary items."""
-                    continue
-            
-            # Nếu đến đây và không phải lần thử cuối, tiếp tục retry
-            if attempt < max_retries:
-                continue
-            
-            # Lần thử cuối, dừng và sử dụng những gì đã có
-            break
-        
-        # Xử lý trường hợp Google AI trả về vocabulary items trực tiếp thay vì bọc trong mảng "vocabulary"
-        if "vocabulary" not in result:
-            # Kiểm tra xem result có các field vocabulary item không (word, definition, example, pronunciation)
-            if all(key in result for key in ["word", "definition", "example"]):
-                # Một vocabulary item được trả về, bọc nó trong mảng
-                result = {"vocabulary": [result]}
-            # Kiểm tra xem result có phải là danh sách vocabulary items không
-            elif isinstance(result, list) and len(result) > 0 and isinstance(result[0], dict):
-                # Kiểm tra xem item đầu tiên có các field vocabulary không
-                if all(key in result[0] for key in ["word", "definition", "example"]):
-                    result = {"vocabulary": result}
-                else:
-                    # Cung cấp thông báo lỗi hữu ích hơn
-                    returned_fields = list(result[0].keys()) if result else []
-                    response_preview = str(result)[:1000] if len(str(result)) > 1000 else str(result)
-                    raise HTTPException(
-                        status_code=500, 
-                        detail=f"Invalid response format: missing 'vocabulary' field. Returned fields: {returned_fields}. Response preview: {response_preview}"
-                    )
-            else:
-                # Cung cấp thông báo lỗi hữu ích hơn
-                returned_fields = list(result.keys()) if isinstance(result, dict) else []
-                response_preview = str(result)[:1000] if len(str(result)) > 1000 else str(result)
+            # Chờ piece đầu tiên ở đây để lỗi kết nối/model vẫn là HTTP error
+            first = await anext(pieces, None)
+            # Content-Encoding rõ ràng để GZipMiddleware không buffer stream
+            return StreamingResponse(
+                _vocabulary_sse(first, pieces),
+                media_type="text/event-stream",
+                headers={"Content-Encoding": "identity", "Cache-Control": "no-cache"}
+            )
+        
+        # Sử dụng temperature thấp hơn để output nhất quán và có cấu trúc hơn
+        response_text = await google_ai_service.generate(
+            system_message=system_message,
+            user_prompt=user_prompt,
+            temperature=0.3,
+            max_output_tokens=min(estimated_tokens, 8192)  # Giới hạn ở 8192 (tối đa cho một số models)
+        )
+        
+        try:
+            result = _to_vocabulary_response(extract_json_from_generate_response(response_text))
+        except (HTTPException, ValidationError):
+            # Response không dùng được, call bổ sung bên dưới sinh toàn bộ items
+            result = VocabularyResponse(vocabulary=[])
+        
+        # Nếu chưa đủ items, chỉ xin thêm phần còn thiếu trong một call thay vì sinh lại toàn bộ
+        missing_count = vocabulary_count - len(result.vocabulary)
+        if missing_count > 0:
+            extra = await _top_up_vocabulary(request, result.vocabulary, missing_count)
+            if extra is None and not result.vocabulary:
                 raise HTTPException(
-                    status_code=500, 
-                    detail=f"Invalid response format: missing 'vocabulary' field. Returned fields: {returned_fields}. Response preview: {response_preview}"
+                    status_code=500,
+                    detail=f"Invalid response format: missing 'vocabulary' field. Response preview: {response_text[:1000]}"
                 )
+            result.vocabulary.extend(extra or [])
         
-        # Xác thực số lượng vocabulary
-        if "vocabulary" in result and isinstance(result["vocabulary"], list):
-            actual_count = len(result["vocabulary"])
-            if actual_count < vocabulary_count:
-                # Ghi cảnh báo - Google AI không trả về đủ items
-                # Sẽ trả về những gì đã có, nhưng điều này có thể được cải thiện với retry logic
-                pass  # Hiện tại, chỉ trả về những gì đã có
-        
-        return VocabularyResponse(**result)
+        return result
         
     except HTTPException:
         raise
@@ -620,19 +690,7 @@ async def generate(request: GenerateRequest):
     Để sử dụng trong production, vui lòng sử dụng các endpoint chuyên biệt.
     """
     try:
-        # Xây dựng system message dựa trên loại task
-        system_messages = {
-            "topics": "You are an expert IELTS content creator. Generate IELTS speaking topics in JSON format.",
-            "questions": "You are an expert IELTS content creator. Generate IELTS speaking questions with sample answers, vocabulary, and structures in JSON format.",
-            "outline": "You are an expert IELTS speaking coach. Generate speaking outlines and structures in JSON format.",
-            "vocabulary": "You are an expert English teacher. Generate vocabulary lists with definitions, examples, and pronunciation in JSON format.",
-            "structures": "You are an expert English teacher. Generate sample sentence structures and patterns in JSON format.",
-            "refine": "You are an expert IELTS speaking coach. Refine and improve speaking responses while preserving the original style.",
-            "compare": "You are an expert IELTS speaking coach. Compare two versions of text and highlight improvements.",
-            "general": "You are a helpful AI assistant. Generate content in the requested format."
-        }
-        
-        system_message = system_messages.get(request.task_type, system_messages["general"])
+        system_message = _SYSTEM_MESSAGES.get(request.task_type, _SYSTEM_MESSAGES["general"])
         
         # Thêm context vào prompt nếu được cung cấp
         user_prompt = request.prompt
@@ -640,7 +698,7 @@ async def generate(request: GenerateRequest):
             context_str = ", ".join([f"{k}: {v}" for k, v in request.context.items()])
             user_prompt = f"{user_prompt}\n\nContext: {context_str}"
         
-        response_text = google_ai_service.generate(
+        response_text = await google_ai_service.generate(
             system_message=system_message,
             user_prompt=user_prompt,
             temperature=0.7,
@@ -700,6 +758,16 @@ async def correct_grammar(request: GrammarCorrectionRequest):
         
         transcription = request.transcription.strip()
         
+        # Một từ đơn (vd. "Yes.") không có ngữ pháp để sửa và transcription từ
+        # speech-to-text không có lỗi chính tả, trả về nguyên văn mà không gọi model
+        if len(transcription.split(maxsplit=1)) == 1:
+            return GrammarCorrectionResponse(
+                original=transcription,
+                corrected=transcription,
+                corrections=[],
+                explanation="No corrections needed. The transcription is grammatically correct."
+            )
+        
         # Xây dựng prompt
         question_context = ""
         if request.textQuestion and request.textQuestion.strip():
@@ -769,7 +837,7 @@ MANDATORY VALIDATION RULES:
         estimated_tokens = max(min_tokens, int(input_length * 2.5))
         max_tokens = min(estimated_tokens, 8192)  # Cap at model limit
         
-        response_text = google_ai_service.generate(
+        response_text = await google_ai_service.generate(
             system_message=system_message,
             user_prompt=user_prompt,
             temperature=0.2,  # Temperature thấp hơn để sửa chữa nhất quán và chính xác hơn
@@ -875,16 +943,12 @@ MANDATORY VALIDATION RULES:
     except HTTPException:
         raise
     except Exception as e:
-        # Ghi log chi tiết lỗi để debug
-        error_detail = f"Error correcting grammar: {str(e)}"
-        if hasattr(e, '__traceback__'):
-            import traceback
-            error_detail += f"\n{traceback.format_exc()}"
-        
+        # Ghi log chi tiết lỗi để debug, không trả traceback về cho client
+        logger.exception("grammar correction failure")
         raise HTTPException(
             status_code=500,
-            detail=error_detail
-        )
+            detail=f"Error correcting grammar: {str(e)}"
+        ) from e
 
 
 @router.post("/improve", response_model=ImproveResponse)
@@ -986,7 +1050,7 @@ IMPORTANT:
         input_length = len(request.transcription)
         estimated_tokens = max(4096, int(input_length * 1.5) + 1000)  # Extra for suggestions
         
-        response_text = google_ai_service.generate(
+        response_text = await google_ai_service.generate(
             system_message=system_message,
             user_prompt=user_prompt,
             temperature=0.3,
@@ -1043,7 +1107,8 @@ async def list_models():
     Trả về danh sách các models hỗ trợ phương thức generateContent.
     """
     try:
-        models = google_ai_service.list_models()
+        # SDK không có bản async cho list_models, chạy trong thread để không chặn event loop
+        models = await asyncio.to_thread(google_ai_service.list_models)
         return {
             "models": models,
             "count": len(models),
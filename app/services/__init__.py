@@ -1,10 +1,16 @@
 from .ollama_service import OllamaService, ollama_service
 from .google_ai_service import GoogleAIService, google_ai_service
+from .llm_cache import LLMCache, llm_cache
+from .batcher import ScoreBatcher, score_batcher
 
 __all__ = [
     "OllamaService",
     "GoogleAIService",
+    "LLMCache",
+    "ScoreBatcher",
     "ollama_service",
     "google_ai_service",
+    "llm_cache",
+    "score_batcher",
 ]
 
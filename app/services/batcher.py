@@ -0,0 +1,175 @@
+"""Micro-batching of concurrent IELTS scoring calls into one Ollama chat"""
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from app.utils import SCORE_SYSTEM_MSG, extract_json_from_response
+from .ollama_service import OllamaService, ollama_service
+
+
+BATCH_SYSTEM_MESSAGE = (
+    "You are an expert IELTS speaking examiner. You will receive several independent "
+    "speaking responses marked '=== ITEM n ==='. Evaluate each one separately and return "
+    "a JSON array with exactly one evaluation object per item, in the same order. "
+    "Always return valid JSON only."
+)
+
+_BATCH_SYSTEM_MSG = {"role": "system", "content": BATCH_SYSTEM_MESSAGE}
+
+_DECODER = json.JSONDecoder()
+
+
+def _extract_json_array(text: str) -> Optional[list]:
+    """Return the first JSON array embedded in text, or None"""
+    idx = text.find('[')
+    while idx != -1:
+        try:
+            value, _ = _DECODER.raw_decode(text, idx)
+            return value
+        except json.JSONDecodeError:
+            idx = text.find('[', idx + 1)
+    return None
+
+
+def _fail_pending(batch: List[Tuple[str, asyncio.Future]]):
+    """Fail futures of a batch that will not be answered because the batcher is closing"""
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(HTTPException(status_code=503, detail="Scoring service is shutting down"))
+
+
+class ScoreBatcher:
+    """
+    Collect /score prompts arriving within a short window and send them as one chat
+
+    Enabled with OLLAMA_BATCH=1. A window holding a single prompt is sent as a
+    normal request, and a batch whose answer cannot be split back into one
+    result per item is retried item by item.
+    """
+
+    def __init__(self, service: OllamaService):
+        self.service = service
+        self.enabled = os.getenv("OLLAMA_BATCH", "0") == "1"
+        self.max_batch = int(os.getenv("OLLAMA_BATCH_MAX", "8"))
+        self.window = float(os.getenv("OLLAMA_BATCH_WINDOW_MS", "10")) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def submit(self, prompt: str) -> dict:
+        """Queue a scoring prompt and wait for its extracted JSON result"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def score(self, messages: List[Dict[str, str]], model: Optional[str] = None, refresh: bool = False) -> dict:
+        """Score one conversation in its own call and return its extracted JSON result"""
+        response_text = await self.service.chat(
+            messages=messages,
+            model=model,
+            temperature=0.3,
+            num_predict=500,
+            stop_at_json=True,
+            format="json",
+            refresh=refresh
+        )
+        return extract_json_from_response(response_text)
+
+    async def close(self):
+        """Stop the background collector and fail prompts that were never answered"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        for task in list(self._dispatches):
+            task.cancel()
+
+        while self._queue is not None and not self._queue.empty():
+            _fail_pending([self._queue.get_nowait()])
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            try:
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                _fail_pending(batch)
+                raise
+
+            # Dispatch without blocking collection of the next window
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            await self._dispatch_batch(batch)
+        except asyncio.CancelledError:
+            _fail_pending(batch)
+            raise
+
+    async def _dispatch_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        if len(batch) == 1:
+            await self._score_single(*batch[0])
+            return
+
+        try:
+            results = await self._score_batch([prompt for prompt, _ in batch])
+        except Exception:
+            results = None
+
+        if results is None:
+            await asyncio.gather(*(self._score_single(prompt, future) for prompt, future in batch))
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _score_single(self, prompt: str, future: asyncio.Future):
+        try:
+            result = await self.score([SCORE_SYSTEM_MSG, {"role": "user", "content": prompt}])
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def _score_batch(self, prompts: List[str]) -> Optional[List[dict]]:
+        """Score all prompts in one call; None if the answer does not split cleanly"""
+        user_prompt = "\n\n".join(
+            f"=== ITEM {i} ===\n{prompt}" for i, prompt in enumerate(prompts, start=1)
+        )
+        response_text = await self.service.chat(
+            messages=[_BATCH_SYSTEM_MSG, {"role": "user", "content": user_prompt}],
+            temperature=0.3,
+            num_predict=500 * len(prompts)
+        )
+
+        results = _extract_json_array(response_text)
+        if not isinstance(results, list) or len(results) != len(prompts):
+            return None
+        if not all(isinstance(result, dict) for result in results):
+            return None
+        return results
+
+
+# Global instance
+score_batcher = ScoreBatcher(ollama_service)
@@ -1,15 +1,33 @@
 """Google AI Studio service for LLM interactions"""
+import asyncio
 import os
-import time
-import google.generativeai as genai
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 from fastapi import HTTPException
 
+from .llm_cache import cache_key, llm_cache
+
+
+def _build_prompt(messages: List[Dict[str, str]]) -> str:
+    """Combine chat messages into one prompt, Google AI has no separate system role here"""
+    prompt_parts = []
+    for msg in messages:
+        if msg["role"] == "system":
+            prompt_parts.append(f"System Instructions: {msg['content']}")
+        elif msg["role"] == "user":
+            prompt_parts.append(f"User: {msg['content']}")
+        elif msg["role"] == "assistant":
+            prompt_parts.append(f"Assistant: {msg['content']}")
+    
+    return "\n\n".join(prompt_parts)
+
 
 class GoogleAIService:
     """Service for interacting with Google AI Studio (Gemini)"""
     
     def __init__(self):
+        # Cacheable calls currently running, by cache key, so identical concurrent
+        # requests share one Gemini call
+        self._inflight: Dict[str, asyncio.Future] = {}
         api_key = os.getenv("GOOGLE_AI_API_KEY")
         if not api_key:
             self.available = False
@@ -17,7 +35,10 @@ class GoogleAIService:
             return
         
         try:
+            # Imported only when configured, the SDK (grpc, protobuf) is slow to import
+            import google.generativeai as genai
             genai.configure(api_key=api_key)
+            self._genai = genai
             model_name = os.getenv("GOOGLE_AI_MODEL", "gemini-pro")
             # Strip "models/" prefix if present (some configs include it)
             if model_name.startswith("models/"):
@@ -32,21 +53,26 @@ class GoogleAIService:
             self.available = False
             self.error = str(e)
     
-    def chat(
+    async def chat(
         self,
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
         temperature: float = 0.3,
-        max_output_tokens: int = 2048
+        max_output_tokens: int = 2048,
+        cache: bool = False
     ) -> str:
         """
         Call Google AI chat API
         
+        Cacheable calls identical to one already running wait for its answer
+        instead of sending another request.
+        
         Args:
             messages: List of message dicts with 'role' and 'content'
             model: Model name (default: uses default_model)
             temperature: Temperature for generation
             max_output_tokens: Max tokens to generate
+            cache: Reuse cached answers regardless of temperature
         
         Returns:
             str: Response text
@@ -60,34 +86,76 @@ class GoogleAIService:
                 detail=error_msg
             )
         
+        model_name = model or self.model_name
+        # Strip "models/" prefix if present
+        if model_name.startswith("models/"):
+            model_name = model_name.replace("models/", "", 1)
+        
+        # Low-temperature calls are deterministic enough to reuse a previous answer.
+        # Keys are namespaced so they never collide with Ollama answers in a shared cache
+        key = cache_key(f"google:{model_name}", messages, temperature, max_output_tokens, force=cache)
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        if key is None:
+            return await self._chat_uncached(key, model_name, messages, temperature, max_output_tokens)
+        
+        call = self._inflight.get(key)
+        if call is None:
+            # Runs as its own task so a caller that disconnects does not cancel
+            # the request the other callers are waiting for
+            call = asyncio.ensure_future(
+                self._chat_uncached(key, model_name, messages, temperature, max_output_tokens)
+            )
+            self._inflight[key] = call
+            call.add_done_callback(lambda done: self._finish_inflight(key, done))
+        return await asyncio.shield(call)
+    
+    def _generation_config(self, temperature: float, max_output_tokens: int) -> Dict[str, Any]:
+        return {
+            "temperature": temperature,
+            "max_output_tokens": max_output_tokens,
+        }
+    
+    def _finish_inflight(self, key: str, call: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not call.cancelled():
+            # Mark the error as retrieved even if every caller has gone away
+            call.exception()
+    
+    async def _chat_uncached(
+        self,
+        key: Optional[str],
+        model_name: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_output_tokens: int
+    ) -> str:
+        """Call Gemini and store the answer in the LLM cache"""
+        content = await self._generate_content(model_name, messages, temperature, max_output_tokens)
+        await llm_cache.set(key, content)
+        return content
+    
+    async def _generate_content(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_output_tokens: int
+    ) -> str:
+        """Call the Gemini API without blocking the event loop, falling back to other models when the quota is exhausted"""
         try:
-            model_name = model or self.model_name
-            # Strip "models/" prefix if present
-            if model_name.startswith("models/"):
-                model_name = model_name.replace("models/", "", 1)
-            genai_model = genai.GenerativeModel(model_name)
+            genai_model = self._genai.GenerativeModel(model_name)
             
-            # Build prompt from messages
-            # Google AI uses a different format - combine system and user messages
-            prompt_parts = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    prompt_parts.append(f"System Instructions: {msg['content']}")
-                elif msg["role"] == "user":
-                    prompt_parts.append(f"User: {msg['content']}")
-                elif msg["role"] == "assistant":
-                    prompt_parts.append(f"Assistant: {msg['content']}")
-            
-            full_prompt = "\n\n".join(prompt_parts)
+            full_prompt = _build_prompt(messages)
+            generation_config = self._generation_config(temperature, max_output_tokens)
             
             # Generate content
             # Pass generation config as keyword arguments
-            response = genai_model.generate_content(
+            response = await genai_model.generate_content_async(
                 full_prompt,
-                generation_config={
-                    "temperature": temperature,
-                    "max_output_tokens": max_output_tokens,
-                }
+                generation_config=generation_config
             )
             
             if not response:
@@ -304,13 +372,10 @@ class GoogleAIService:
                         if fallback_model.startswith("models/"):
                             fallback_model = fallback_model.replace("models/", "", 1)
                         
-                        genai_model = genai.GenerativeModel(fallback_model)
-                        response = genai_model.generate_content(
+                        genai_model = self._genai.GenerativeModel(fallback_model)
+                        response = await genai_model.generate_content_async(
                             full_prompt,
-                            generation_config={
-                                "temperature": temperature,
-                                "max_output_tokens": max_output_tokens,
-                            }
+                            generation_config=generation_config
                         )
                         
                         # If we get here, fallback worked - extract response
@@ -360,13 +425,14 @@ class GoogleAIService:
                 detail=f"Error calling Google AI API: {error_str}"
             )
     
-    def generate(
+    async def generate(
         self,
         system_message: str,
         user_prompt: str,
         temperature: float = 0.7,
         max_output_tokens: int = 2048,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        cache: bool = False
     ) -> str:
         """
         Generate text using Google AI
@@ -377,6 +443,7 @@ class GoogleAIService:
             temperature: Temperature for generation
             max_output_tokens: Max tokens to generate
             model: Model name (default: uses default_model)
+            cache: Reuse cached answers regardless of temperature
         
         Returns:
             str: Generated text
@@ -386,13 +453,74 @@ class GoogleAIService:
             {"role": "user", "content": user_prompt}
         ]
         
-        return self.chat(
+        return await self.chat(
             messages=messages,
             model=model,
             temperature=temperature,
-            max_output_tokens=max_output_tokens
+            max_output_tokens=max_output_tokens,
+            cache=cache
         )
     
+    async def stream_generate(
+        self,
+        system_message: str,
+        user_prompt: str,
+        temperature: float = 0.7,
+        max_output_tokens: int = 2048,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate text using Google AI, yielding pieces as they are produced
+        
+        Streamed answers bypass the LLM cache and the quota fallback models.
+        Errors raised before the first piece are HTTPExceptions like generate().
+        """
+        if not self.available:
+            error_msg = "Google AI service is not available."
+            if self.error:
+                error_msg += f" Error: {self.error}"
+            raise HTTPException(
+                status_code=503,
+                detail=error_msg
+            )
+        
+        model_name = model or self.model_name
+        if model_name.startswith("models/"):
+            model_name = model_name.replace("models/", "", 1)
+        messages = [
+            {"role": "system", "content": f"{system_message} Return valid JSON only."},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        generation_config = self._generation_config(temperature, max_output_tokens)
+        
+        try:
+            genai_model = self._genai.GenerativeModel(model_name)
+            response = await genai_model.generate_content_async(
+                _build_prompt(messages),
+                generation_config=generation_config,
+                stream=True
+            )
+            async for chunk in response:
+                try:
+                    piece = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. only a finish reason)
+                    continue
+                if piece:
+                    yield piece
+        except Exception as e:
+            error_str = str(e)
+            if "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower():
+                raise HTTPException(
+                    status_code=429,
+                    detail=f"Quota exceeded for model {model_name}. Original error: {error_str}"
+                )
+            raise HTTPException(
+                status_code=503,
+                detail=f"Error calling Google AI API: {error_str}"
+            )
+    
     def list_models(self) -> List[Dict[str, Any]]:
         """
         List all available Google AI models
@@ -410,7 +538,7 @@ class GoogleAIService:
             )
         
         try:
-            models = genai.list_models()
+            models = self._genai.list_models()
             model_list = []
             
             for model in models:
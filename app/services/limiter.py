@@ -0,0 +1,59 @@
+"""Adaptive concurrency limiter for outbound LLM calls"""
+import asyncio
+from typing import Callable, Optional
+
+
+class AdaptiveLimiter:
+    """
+    Async context manager bounding concurrent calls, with AIMD capacity control
+
+    Capacity is halved whenever a call fails with an overload error and grows
+    by about 0.5 per window of successful calls, up to `maximum`.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        maximum: Optional[int] = None,
+        is_overload: Optional[Callable[[BaseException], bool]] = None
+    ):
+        self.maximum = max(1, maximum or initial)
+        self.capacity = float(max(1, min(initial, self.maximum)))
+        self.in_flight = 0
+        self.waiting = 0
+        self._is_overload = is_overload or (lambda exc: False)
+        self._cond = asyncio.Condition()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.capacity)
+
+    async def __aenter__(self):
+        async with self._cond:
+            self.waiting += 1
+            try:
+                await self._cond.wait_for(self._has_slot)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self.in_flight -= 1
+            if exc is None:
+                # Additive increase: +0.5 spread over one window of `capacity` calls
+                self.capacity = min(self.maximum, self.capacity + 0.5 / self.capacity)
+            elif self._is_overload(exc):
+                # Multiplicative decrease
+                self.capacity = max(1.0, self.capacity * 0.5)
+            self._cond.notify_all()
+        return False
+
+    def stats(self) -> dict:
+        """Current limiter state for health reporting"""
+        return {
+            "capacity": int(self.capacity),
+            "max_capacity": self.maximum,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
@@ -0,0 +1,112 @@
+"""Response cache for low-temperature LLM calls"""
+import hashlib
+import os
+from typing import Optional, List, Dict, Union
+
+import orjson
+from cachetools import TTLCache
+
+
+# Above this temperature the output is too random for a cached answer to be useful
+MAX_CACHEABLE_TEMPERATURE = 0.4
+
+
+def cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    num_predict: int,
+    force: bool = False,
+    format: Union[str, dict, None] = "",
+    stop_at_json: bool = False
+) -> Optional[str]:
+    """
+    Build a stable cache key for an LLM call
+
+    Args:
+        force: Cache even above MAX_CACHEABLE_TEMPERATURE, for calls whose
+            prompt is fully determined by structured request fields
+        format: Output format or JSON schema; it changes the answer, so it is keyed
+        stop_at_json: Whether generation stops at the first complete JSON
+            object, which can cut the answer short
+
+    Returns:
+        Optional[str]: sha256 hex digest, or None if the call should not be cached
+    """
+    if temperature > MAX_CACHEABLE_TEMPERATURE and not force:
+        return None
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "num_predict": num_predict,
+        "format": format,
+        "stop_at_json": stop_at_json,
+    }
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class LLMCache:
+    """In-process LRU cache for LLM responses, backed by Redis when REDIS_URL is set"""
+
+    def __init__(self):
+        self.maxsize = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+        self.ttl = int(os.getenv("LLM_CACHE_TTL", "3600"))
+        self.hits = 0
+        self.misses = 0
+        self._local = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+        self._redis = None
+
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            # Optional dependency, only needed when a shared cache is configured
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url)
+
+    async def get(self, key: Optional[str]) -> Optional[str]:
+        """Return the cached response for key, or None on a miss"""
+        if key is None:
+            return None
+
+        value = self._local.get(key)
+        if value is None and self._redis is not None:
+            try:
+                raw = await self._redis.get(f"llm:{key}")
+            except Exception:
+                # The cache is best-effort, never fail a request because Redis is down
+                raw = None
+            if raw is not None:
+                value = raw.decode("utf-8")
+                self._local[key] = value
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: Optional[str], value: str, ttl: Optional[int] = None):
+        """Store a response under key"""
+        if key is None:
+            return
+
+        self._local[key] = value
+        if self._redis is not None:
+            try:
+                await self._redis.set(f"llm:{key}", value, ex=ttl or self.ttl)
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, object]:
+        """Hit/miss counters for health reporting"""
+        return {
+            "backend": "redis" if self._redis is not None else "memory",
+            "size": len(self._local),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global instance
+llm_cache = LLMCache()
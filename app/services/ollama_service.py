@@ -1,9 +1,36 @@
 """Ollama service for LLM interactions"""
+import asyncio
+import json
 import os
+import time
+from functools import lru_cache
+import httpx
 import ollama
-from typing import Optional, List, Dict
+from typing import AsyncIterator, Optional, List, Dict, Union
 from fastapi import HTTPException
 
+from .limiter import AdaptiveLimiter
+from .llm_cache import cache_key, llm_cache
+
+
+_DECODER = json.JSONDecoder()
+
+
+@lru_cache(maxsize=64)
+def _system_msg(system_message: str) -> Dict[str, str]:
+    """System message dict for generate(), shared across calls with the same text"""
+    return {"role": "system", "content": f"{system_message} Return valid JSON only."}
+
+
+# Model names only enrich 404 messages, a slightly stale list is fine. The
+# health loop refreshes it well within this window
+MODELS_CACHE_TTL = 60.0
+
+
+def _is_overload_error(error: BaseException) -> bool:
+    """Whether Ollama rejected a call because it is saturated"""
+    return isinstance(error, ollama.ResponseError) and error.status_code in (429, 503)
+
 
 class OllamaService:
     """Service for interacting with Ollama LLM"""
@@ -11,115 +38,327 @@ class OllamaService:
     def __init__(self):
         self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
         self.default_model = os.getenv("OLLAMA_MODEL", "llama3.1:latest")
+        # Max concurrent chat calls from this worker; keep it at or below the
+        # server's OLLAMA_NUM_PARALLEL so requests queue here instead of in Ollama
+        self.max_inflight = int(os.getenv("OLLAMA_INFLIGHT", "8"))
+        self.num_parallel = int(os.getenv("OLLAMA_NUM_PARALLEL", str(self.max_inflight)))
+        self.pool_max = int(os.getenv("OLLAMA_POOL_MAX", "100"))
+        self.pool_keepalive = int(os.getenv("OLLAMA_POOL_KEEPALIVE", "40"))
+        self.timeout = float(os.getenv("OLLAMA_TIMEOUT", "300"))
+        # Slowest generation speed still considered healthy; the overall deadline of a
+        # call grows with num_predict at this rate so long answers are not cut off
+        self.min_tokens_per_sec = float(os.getenv("OLLAMA_MIN_TOKENS_PER_SEC", "5"))
+        # Schema-constrained output needs Ollama >= 0.5; older servers only know "json"
+        self.schema_format = os.getenv("OLLAMA_SCHEMA_FORMAT", "0") == "1"
         self.client = None
         self.available = False
         self.error = None
-        self._check_connection()
+        # Availability is refreshed by a background task, requests only read the flag
+        self.health_interval = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+        self._health_task: Optional[asyncio.Task] = None
+        self._check_lock = asyncio.Lock()
+        self._models_cache = (0.0, [])
+        # Cacheable calls currently running, by cache key, so identical concurrent
+        # requests share one generation instead of each reaching Ollama. The key
+        # covers format and stop_at_json, so only calls expecting the same
+        # (possibly early-stopped) answer are joined
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Backs off when Ollama answers 429/503, recovers up to OLLAMA_NUM_PARALLEL
+        self.limiter = AdaptiveLimiter(
+            self.max_inflight,
+            maximum=self.num_parallel,
+            is_overload=_is_overload_error
+        )
     
-    def _check_connection(self):
+    def _create_client(self):
+        """Create an Ollama client backed by a pooled keep-alive HTTP transport"""
+        transport = httpx.AsyncHTTPTransport(
+            retries=3,
+            limits=httpx.Limits(
+                max_keepalive_connections=self.pool_keepalive,
+                max_connections=self.pool_max,
+                keepalive_expiry=30.0
+            )
+        )
+        return ollama.AsyncClient(
+            host=self.base_url,
+            timeout=httpx.Timeout(self.timeout, connect=10.0),
+            transport=transport
+        )
+    
+    async def _check_connection(self):
         """Check and update Ollama connection status"""
-        try:
-            if self.client is None:
-                self.client = ollama.Client(host=self.base_url)
-            
-            # Test connection
-            self.client.list()
-            self.available = True
-            self.error = None
-            return True
-        except Exception as e:
-            self.available = False
-            self.error = str(e)
-            return False
+        # Concurrent callers (health loop, /reconnect) share one in-flight check
+        if self._check_lock.locked():
+            async with self._check_lock:
+                return self.available
+        
+        async with self._check_lock:
+            try:
+                if self.client is None:
+                    self.client = self._create_client()
+                
+                # Test connection; the listing also refreshes the model names
+                # quoted by 404 errors, so that error path needs no request
+                models = await asyncio.wait_for(self.client.list(), timeout=10.0)
+                self._store_models(models)
+                self.available = True
+                self.error = None
+                return True
+            except Exception as e:
+                self.available = False
+                self.error = str(e) or "Connection timed out"
+                return False
+    
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self._check_connection()
     
-    def reconnect(self):
+    def start_health_checks(self):
+        """Start refreshing availability every OLLAMA_HEALTH_INTERVAL seconds"""
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+    
+    async def reconnect(self):
         """Manually retry Ollama connection"""
-        return self._check_connection()
+        return await self._check_connection()
+    
+    async def close(self):
+        """Stop health checks and close pooled connections to Ollama"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        
+        if self.client is not None:
+            # ollama.AsyncClient has no close() of its own, close the httpx client it wraps
+            await self.client._client.aclose()
+            self.client = None
+            self.available = False
+    
+    def _store_models(self, models) -> Optional[List[str]]:
+        """Cache model names from a list() response; None if it has no model list"""
+        if not models or "models" not in models:
+            return None
+        names = [m["name"] for m in models["models"] if "name" in m]
+        self._models_cache = (time.monotonic(), names)
+        return names
     
-    def _get_available_models(self):
-        """Get list of available Ollama models"""
+    async def _get_available_models(self):
+        """Get list of available Ollama models, cached for MODELS_CACHE_TTL seconds"""
+        cached_at, names = self._models_cache
+        if names and time.monotonic() - cached_at < MODELS_CACHE_TTL:
+            return names
+        
         try:
             if self.client:
-                models = self.client.list()
-                if models and "models" in models:
-                    return [m.get("name", "unknown") for m in models["models"]]
-                return ["Unable to list models"]
-        except:
+                names = self._store_models(await self.client.list())
+                return names if names is not None else ["Unable to list models"]
+        except (httpx.HTTPError, ollama.ResponseError, KeyError, TypeError):
             pass
         return ["Unable to retrieve models"]
     
-    def chat(
+    async def _ensure_available(self):
+        """Raise 503 unless the last health check found Ollama reachable"""
+        if not self.available:
+            error_msg = "Ollama service is not available. Please ensure Ollama server is running."
+            if self.error:
+                error_msg += f" Error: {self.error}"
+            error_msg += f" Ollama URL: {self.base_url}"
+            raise HTTPException(
+                status_code=503,
+                detail=error_msg
+            )
+    
+    async def _to_http_error(self, model_name: str, ollama_error: Exception) -> HTTPException:
+        """Map an Ollama client error to the HTTPException returned to callers"""
+        if isinstance(ollama_error, httpx.TimeoutException):
+            return HTTPException(
+                status_code=504,
+                detail=f"Ollama did not respond within {self.timeout:g}s"
+            )
+        if isinstance(ollama_error, asyncio.TimeoutError):
+            return HTTPException(
+                status_code=504,
+                detail="Ollama did not finish generating within the call deadline"
+            )
+        
+        # Check if it's a model not found error
+        error_str = str(ollama_error).lower()
+        if "model" in error_str and ("not found" in error_str or "does not exist" in error_str):
+            return HTTPException(
+                status_code=404,
+                detail=f"Model '{model_name}' not found. Available models: {await self._get_available_models()}. Please pull the model using: ollama pull {model_name}"
+            )
+        return HTTPException(
+            status_code=503,
+            detail=f"Error calling Ollama API: {str(ollama_error)}"
+        )
+    
+    async def chat(
         self,
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
         temperature: float = 0.3,
-        num_predict: int = 500
+        num_predict: int = 500,
+        stop_at_json: bool = False,
+        cache: bool = False,
+        format: Union[str, dict] = "",
+        refresh: bool = False
     ) -> str:
         """
         Call Ollama chat API
         
+        Cacheable calls identical to one already running, including format and
+        stop_at_json, wait for its answer instead of starting another generation.
+        
         Args:
             messages: List of message dicts with 'role' and 'content'
             model: Model name (default: uses default_model)
             temperature: Temperature for generation
             num_predict: Max tokens to predict
+            stop_at_json: Stream the answer and stop generation as soon as
+                a complete JSON object has been received
+            cache: Reuse cached answers regardless of temperature
+            format: "json" for JSON mode, or a JSON schema to constrain the
+                output (sent as "json" unless OLLAMA_SCHEMA_FORMAT=1)
+            refresh: Ignore a cached answer; the new answer still replaces it
         
         Returns:
             str: Response text
         """
-        # Retry connection check before processing
-        if not self.available:
-            self._check_connection()
+        model_name = model or self.default_model
         
-        if not self.available:
-            error_msg = "Ollama service is not available. Please ensure Ollama server is running."
-            if self.error:
-                error_msg += f" Error: {self.error}"
-            error_msg += f" Ollama URL: {self.base_url}"
-            raise HTTPException(
-                status_code=503,
-                detail=error_msg
+        # Low-temperature calls are deterministic enough to reuse a previous answer
+        key = cache_key(
+            model_name, messages, temperature, num_predict,
+            force=cache, format=format, stop_at_json=stop_at_json
+        )
+        cached = None if refresh else await llm_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        if key is None:
+            return await self._chat_uncached(key, model_name, messages, temperature, num_predict, stop_at_json, format)
+        
+        call = self._inflight.get(key)
+        if call is None:
+            # Runs as its own task so a caller that disconnects does not cancel
+            # the generation the other callers are waiting for
+            call = asyncio.ensure_future(
+                self._chat_uncached(key, model_name, messages, temperature, num_predict, stop_at_json, format)
             )
+            self._inflight[key] = call
+            call.add_done_callback(lambda done: self._finish_inflight(key, done))
+        return await asyncio.shield(call)
+    
+    def _finish_inflight(self, key: str, call: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not call.cancelled():
+            # Mark the error as retrieved even if every caller has gone away
+            call.exception()
+    
+    async def _chat_uncached(
+        self,
+        key: Optional[str],
+        model_name: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        num_predict: int,
+        stop_at_json: bool,
+        format: Union[str, dict]
+    ) -> str:
+        """Call Ollama chat under the limiter and store the answer in the LLM cache"""
+        await self._ensure_available()
         
-        model_name = model or self.default_model
+        options = {
+            "temperature": temperature,
+            "num_predict": num_predict
+        }
+        if isinstance(format, dict) and not self.schema_format:
+            format = "json"
+        
+        # Bound the whole call, httpx's timeout only applies per read. The budget is
+        # OLLAMA_TIMEOUT for queueing and the first token plus time for num_predict tokens
+        deadline = self.timeout + num_predict / self.min_tokens_per_sec
         
         try:
-            response = self.client.chat(
-                model=model_name,
-                messages=messages,
-                options={
-                    "temperature": temperature,
-                    "num_predict": num_predict
-                }
-            )
+            async with self.limiter:
+                if stop_at_json:
+                    content = await asyncio.wait_for(
+                        self._chat_until_json(model_name, messages, options, format),
+                        deadline
+                    )
+                else:
+                    response = await asyncio.wait_for(
+                        self.client.chat(
+                            model=model_name,
+                            messages=messages,
+                            format=format,
+                            options=options
+                        ),
+                        deadline
+                    )
+                    content = response["message"]["content"] if response and "message" in response else None
         except Exception as ollama_error:
-            # Check if it's a model not found error
-            error_str = str(ollama_error).lower()
-            if "model" in error_str and ("not found" in error_str or "does not exist" in error_str):
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Model '{model_name}' not found. Available models: {self._get_available_models()}. Please pull the model using: ollama pull {model_name}"
-                )
-            raise HTTPException(
-                status_code=503,
-                detail=f"Error calling Ollama API: {str(ollama_error)}"
-            )
+            raise await self._to_http_error(model_name, ollama_error)
         
-        if not response or "message" not in response:
+        if content is None:
             raise HTTPException(
                 status_code=500,
                 detail="Invalid response from Ollama API"
             )
         
-        return response["message"]["content"]
+        await llm_cache.set(key, content)
+        return content
     
-    def generate(
+    async def _chat_until_json(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, float],
+        format: Union[str, dict] = ""
+    ) -> str:
+        """Stream a chat and return as soon as the text holds a complete JSON object"""
+        stream = await self.client.chat(
+            model=model_name,
+            messages=messages,
+            stream=True,
+            format=format,
+            options=options
+        )
+        parts = []
+        try:
+            async for chunk in stream:
+                piece = chunk.get("message", {}).get("content", "")
+                parts.append(piece)
+                if "}" not in piece:
+                    continue
+                text = "".join(parts)
+                start = text.find("{")
+                if start == -1:
+                    continue
+                try:
+                    _DECODER.raw_decode(text, start)
+                except json.JSONDecodeError:
+                    continue
+                break
+        finally:
+            # Closing the stream drops the HTTP response, which makes Ollama stop generating
+            await stream.aclose()
+        return "".join(parts)
+    
+    async def generate(
         self,
         system_message: str,
         user_prompt: str,
         temperature: float = 0.7,
         num_predict: int = 2000,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        cache: bool = False,
+        format: Union[str, dict] = "",
+        stop_at_json: bool = False,
+        refresh: bool = False
     ) -> str:
         """
         Generate text using Ollama
@@ -130,22 +369,73 @@ class OllamaService:
             temperature: Temperature for generation
             num_predict: Max tokens to predict
             model: Model name (default: uses default_model)
+            cache: Reuse cached answers regardless of temperature
+            format: "json" or a JSON schema, see chat()
+            stop_at_json: Stop generation once a complete JSON object has
+                been received, see chat()
+            refresh: Ignore a cached answer, see chat()
         
         Returns:
             str: Generated text
         """
-        messages = [
-            {"role": "system", "content": f"{system_message} Return valid JSON only."},
-            {"role": "user", "content": user_prompt}
-        ]
+        messages = [_system_msg(system_message), {"role": "user", "content": user_prompt}]
         
-        return self.chat(
+        return await self.chat(
             messages=messages,
             model=model,
             temperature=temperature,
-            num_predict=num_predict
+            num_predict=num_predict,
+            cache=cache,
+            format=format,
+            stop_at_json=stop_at_json,
+            refresh=refresh
         )
 
+    async def stream_generate(
+        self,
+        system_message: str,
+        user_prompt: str,
+        temperature: float = 0.7,
+        num_predict: int = 2000,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate text using Ollama, yielding pieces as they are produced
+        
+        Holds a limiter slot until the stream is exhausted or closed. Errors
+        raised before the first piece are HTTPExceptions like generate().
+        """
+        model_name = model or self.default_model
+        messages = [_system_msg(system_message), {"role": "user", "content": user_prompt}]
+        options = {
+            "temperature": temperature,
+            "num_predict": num_predict
+        }
+        
+        await self._ensure_available()
+        
+        # Errors are translated outside the limiter so it sees the original
+        # exception and can back off on overload
+        try:
+            async with self.limiter:
+                # The request is only sent once iteration starts, so errors surface in the loop
+                stream = await self.client.chat(
+                    model=model_name,
+                    messages=messages,
+                    stream=True,
+                    options=options
+                )
+                try:
+                    async for chunk in stream:
+                        piece = chunk.get("message", {}).get("content", "")
+                        if piece:
+                            yield piece
+                finally:
+                    # Also runs when the HTTP client disconnects, which stops generation
+                    await stream.aclose()
+        except Exception as ollama_error:
+            raise await self._to_http_error(model_name, ollama_error)
+
 
 # Global instance
 ollama_service = OllamaService()
@@ -1,7 +1,8 @@
-from .prompts import build_ielts_prompt
+from .prompts import SCORE_SYSTEM_MSG, build_ielts_prompt
 from .json_extractor import extract_json_from_response, extract_json_from_generate_response
 
 __all__ = [
+    "SCORE_SYSTEM_MSG",
     "build_ielts_prompt",
     "extract_json_from_response",
     "extract_json_from_generate_response",
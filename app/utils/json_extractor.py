@@ -1,43 +1,102 @@
 """JSON extraction utilities from LLM responses"""
 import json
 import re
-from typing import Dict
+
+import orjson
+from typing import Any, Dict, Iterator, Optional
+
+
+# Patterns are compiled once at import since they run on every LLM response
+_BAND_JSON_RE = re.compile(r'\{[^{}]*"bandScore"[^{}]*\}', re.DOTALL)
+# All score fields in one alternation so the fallback scans the text once;
+# the feedback string may contain escaped quotes
+_SCORE_FIELDS_RE = re.compile(
+    r'"(?P<key>bandScore|pronunciationScore|grammarScore|vocabularyScore|fluencyScore)"\s*:\s*(?P<val>[0-9.]+)'
+    r'|"overallFeedback"\s*:\s*"(?P<fb>(?:[^"\\]|\\.)*)"',
+    re.DOTALL
+)
+_MD_JSON_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_TRAILING_COMMA_OBJ_RE = re.compile(r',\s*}')
+_TRAILING_COMMA_ARR_RE = re.compile(r',\s*]')
+_DECODER = json.JSONDecoder()
+
+
+def _iter_json_objects(text: str) -> Iterator[dict]:
+    """Yield each top-level JSON object found in text, left to right"""
+    idx = text.find('{')
+    while idx != -1:
+        try:
+            obj, end = _DECODER.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            idx = text.find('{', idx + 1)
+            continue
+        yield obj
+        idx = text.find('{', end)
+
+
+def _parse_brace_span(text: str) -> Optional[Any]:
+    """Parse text from its first '{' to its last '}', the usual shape of JSON wrapped in prose"""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end < start:
+        return None
+    try:
+        return orjson.loads(text[start:end + 1])
+    except orjson.JSONDecodeError:
+        return None
 
 
 def extract_json_from_response(text: str) -> dict:
     """Extract JSON from LLM response"""
+    # Fast path: with JSON mode the whole response is usually the score object
+    stripped = text.strip()
+    parsed = None
+    if stripped[:1] == '{':
+        try:
+            parsed = orjson.loads(stripped)
+        except orjson.JSONDecodeError:
+            pass
+        else:
+            if isinstance(parsed, dict) and "bandScore" in parsed:
+                return parsed
+    else:
+        # A single object wrapped in prose or a code fence parses in one orjson call
+        spanned = _parse_brace_span(stripped)
+        if isinstance(spanned, dict) and "bandScore" in spanned:
+            return spanned
+    
     # Try to find JSON in the response
-    json_match = re.search(r'\{[^{}]*"bandScore"[^{}]*\}', text, re.DOTALL)
+    json_match = _BAND_JSON_RE.search(text)
     if json_match:
         try:
-            return json.loads(json_match.group())
-        except:
+            return orjson.loads(json_match.group())
+        except orjson.JSONDecodeError:
             pass
     
-    # Try to parse entire response as JSON
+    # Otherwise accept the entire response if it is JSON
+    if parsed is not None:
+        return parsed
     try:
-        return json.loads(text)
-    except:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
         pass
     
     # Fallback: try to extract values using regex
     result = {}
-    patterns = {
-        "bandScore": r'"bandScore"\s*:\s*([0-9.]+)',
-        "pronunciationScore": r'"pronunciationScore"\s*:\s*([0-9.]+)',
-        "grammarScore": r'"grammarScore"\s*:\s*([0-9.]+)',
-        "vocabularyScore": r'"vocabularyScore"\s*:\s*([0-9.]+)',
-        "fluencyScore": r'"fluencyScore"\s*:\s*([0-9.]+)',
-        "overallFeedback": r'"overallFeedback"\s*:\s*"([^"]+)"'
-    }
-    
-    for key, pattern in patterns.items():
-        match = re.search(pattern, text)
-        if match:
-            if key == "overallFeedback":
-                result[key] = match.group(1)
-            else:
-                result[key] = float(match.group(1))
+    for match in _SCORE_FIELDS_RE.finditer(text):
+        key = match.group("key") or "overallFeedback"
+        if key in result:
+            # Keep the first occurrence of each field
+            continue
+        if key == "overallFeedback":
+            feedback = match.group("fb")
+            try:
+                # Unescape \" and friends the same way a JSON parser would
+                result[key] = orjson.loads(f'"{feedback}"')
+            except orjson.JSONDecodeError:
+                result[key] = feedback
+        else:
+            result[key] = float(match.group("val"))
     
     return result
 
@@ -50,109 +109,64 @@ def extract_json_from_generate_response(response_text: str) -> dict:
     # Clean the response text
     response_text = response_text.strip()
     
-    # Try to parse as JSON directly
-    try:
-        result = json.loads(response_text)
-        
-        # If result is a dict with only "content" key and content is a JSON string, parse it
-        if isinstance(result, dict) and len(result) == 1 and "content" in result:
-            content_value = result["content"]
-            if isinstance(content_value, str):
-                try:
-                    # Try to parse the content as JSON
-                    parsed_content = json.loads(content_value)
-                    if isinstance(parsed_content, dict):
-                        result = parsed_content
-                except:
-                    pass  # Keep original result if parsing fails
-        
-        return result
-        
-    except json.JSONDecodeError:
-        # JSON parsing failed, try to extract JSON from text
-        pass
+    # A fenced answer is parsed directly once the ```json ... ``` wrapper is cut off
+    candidate = response_text
+    if candidate.startswith('```') and candidate.endswith('```') and len(candidate) > 6:
+        candidate = candidate[3:-3].removeprefix('json').strip()
     
-    # Try to extract JSON from markdown code blocks
-    json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-    if json_match:
+    # Dispatch on the first character so the common shapes are parsed without
+    # a failed parse first
+    if candidate[:1] in ('{', '['):
         try:
-            result = json.loads(json_match.group(1))
-            return result
-        except json.JSONDecodeError:
+            result = orjson.loads(candidate)
+        except orjson.JSONDecodeError:
             pass
+        else:
+            # Unwrap {"content": "<json string>"} produced by some callers
+            if (
+                isinstance(result, dict)
+                and result.keys() == {"content"}
+                and isinstance(result["content"], str)
+                and result["content"].lstrip().startswith('{')
+            ):
+                try:
+                    result = orjson.loads(result["content"])
+                except orjson.JSONDecodeError:
+                    pass
+            return result
+    if response_text.startswith('```'):
+        json_match = _MD_JSON_RE.search(response_text)
+        if json_match:
+            try:
+                return orjson.loads(json_match.group(1))
+            except orjson.JSONDecodeError:
+                pass
     
-    # Try to find JSON object in text (improved regex to handle nested objects)
-    # Find the first { and match until the last } with balanced braces
-    brace_count = 0
-    start_idx = response_text.find('{')
-    if start_idx >= 0:
-        for i in range(start_idx, len(response_text)):
-            if response_text[i] == '{':
-                brace_count += 1
-            elif response_text[i] == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    # Found complete JSON object
-                    json_str = response_text[start_idx:i+1]
-                    try:
-                        result = json.loads(json_str)
-                        return result
-                    except json.JSONDecodeError:
-                        # Try to fix common JSON issues
-                        # Remove trailing commas
-                        json_str = re.sub(r',\s*}', '}', json_str)
-                        json_str = re.sub(r',\s*]', ']', json_str)
-                        try:
-                            result = json.loads(json_str)
-                            return result
-                        except:
-                            pass
-                    break
+    # One object wrapped in prose parses in a single orjson call; several
+    # separate objects make the span invalid and go through the scan below
+    spanned = _parse_brace_span(response_text)
+    if isinstance(spanned, dict):
+        return spanned
     
-    # Try simple regex as fallback
-    json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL)
-    if json_match:
-        try:
-            result = json.loads(json_match.group(0))
-            return result
-        except json.JSONDecodeError:
-            pass
+    # Trailing commas are the usual reason the outer object fails to parse. Repair
+    # them before scanning, or the scan would return a nested object on its own
+    repaired = _TRAILING_COMMA_OBJ_RE.sub('}', response_text)
+    repaired = _TRAILING_COMMA_ARR_RE.sub(']', repaired)
+    if repaired != response_text:
+        spanned = _parse_brace_span(repaired)
+        if isinstance(spanned, dict):
+            return spanned
     
-    # Try to extract multiple JSON objects (in case response contains multiple vocabulary items)
-    # This handles cases where Google AI returns multiple separate JSON objects
-    json_objects = []
-    start_idx = 0
-    while start_idx < len(response_text):
-        brace_count = 0
-        obj_start = response_text.find('{', start_idx)
-        if obj_start < 0:
-            break
-        
-        for i in range(obj_start, len(response_text)):
-            if response_text[i] == '{':
-                brace_count += 1
-            elif response_text[i] == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    json_str = response_text[obj_start:i+1]
-                    try:
-                        obj = json.loads(json_str)
-                        json_objects.append(obj)
-                    except json.JSONDecodeError:
-                        pass
-                    start_idx = i + 1
-                    break
-        else:
-            break
+    # Scan the text for JSON objects; raw_decode runs in C and respects string literals
+    json_objects = list(_iter_json_objects(response_text))
+    if not json_objects and repaired != response_text:
+        json_objects = list(_iter_json_objects(repaired))
     
-    # If we found multiple JSON objects, try to combine them
+    # Google AI sometimes returns vocabulary items as separate JSON objects, combine them
     if len(json_objects) > 1:
-        # Check if they're all vocabulary items
         if all(isinstance(obj, dict) and all(key in obj for key in ["word", "definition", "example"]) for obj in json_objects):
             return {"vocabulary": json_objects}
-        # Otherwise return as list
-        return json_objects[0] if len(json_objects) == 1 else {"items": json_objects}
-    elif len(json_objects) == 1:
+    if json_objects:
         return json_objects[0]
     
     # If all parsing fails, return content as text with error info
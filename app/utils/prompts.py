@@ -1,29 +1,14 @@
 """Prompt building utilities for IELTS evaluation and generation"""
+from functools import lru_cache
 
 
-def build_ielts_prompt(transcription: str, question_text: str, topic: str, level: str) -> str:
-    """Build prompt for IELTS scoring"""
-    question_section = ""
-    if question_text:
-        question_section = f"""Question:
-{question_text}
-
-"""
-    
-    relevance_warning = ""
-    if question_text:
-        relevance_warning = """
-IMPORTANT: First check if the student's response is relevant to the question asked. If the response does not answer the question or is about a completely different topic, you MUST significantly penalize the scores, especially:
-- Band Score: Reduce by 2-3 points if completely off-topic
-- Fluency Score: Reduce significantly as the response lacks coherence with the question
-- Vocabulary Score: May be less relevant if off-topic
-- Grammar Score: Can still be evaluated but overall band should reflect irrelevance
+# System message of every IELTS scoring chat (v1, v2 and the score batcher).
+# Shared as one dict because the LLM clients only read message dicts
+SCORE_SYSTEM_MSG = {"role": "system", "content": "You are an expert IELTS speaking examiner. Always return valid JSON only."}
 
-If the response is off-topic, mention this clearly in the overallFeedback.
-
-"""
-    
-    return f"""You are an expert IELTS speaking examiner. Evaluate the following speaking response.
+# Static prompt scaffold, filled with a single format_map call per request. The
+# question section and relevance warning are only present when a question is given
+_PROMPT_TEMPLATE = """You are an expert IELTS speaking examiner. Evaluate the following speaking response.
 
 Topic: {topic}
 Target Level: {level}
@@ -50,3 +35,30 @@ Evaluation Criteria:
 
 Return ONLY valid JSON, no additional text."""
 
+_QUESTION_SECTION_FMT = """Question:
+{question_text}
+
+"""
+
+_RELEVANCE_WARNING = """
+IMPORTANT: First check if the student's response is relevant to the question asked. If the response does not answer the question or is about a completely different topic, you MUST significantly penalize the scores, especially:
+- Band Score: Reduce by 2-3 points if completely off-topic
+- Fluency Score: Reduce significantly as the response lacks coherence with the question
+- Vocabulary Score: May be less relevant if off-topic
+- Grammar Score: Can still be evaluated but overall band should reflect irrelevance
+
+If the response is off-topic, mention this clearly in the overallFeedback.
+
+"""
+
+
+@lru_cache(maxsize=1024)
+def build_ielts_prompt(transcription: str, question_text: str, topic: str, level: str) -> str:
+    """Build prompt for IELTS scoring; repeated argument tuples reuse the cached string"""
+    return _PROMPT_TEMPLATE.format_map({
+        "topic": topic,
+        "level": level,
+        "transcription": transcription,
+        "question_section": _QUESTION_SECTION_FMT.format(question_text=question_text) if question_text else "",
+        "relevance_warning": _RELEVANCE_WARNING if question_text else "",
+    })
@@ -0,0 +1,14 @@
+"""Gunicorn settings for running the service with multiple Uvicorn workers"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '11434')}"
+
+# UvicornWorker picks uvloop and httptools automatically (installed via uvicorn[standard])
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2))
+worker_connections = 1000
+keepalive = 30
+
+# LLM calls can run for minutes, don't let the arbiter kill busy workers
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "600"))
+graceful_timeout = 30
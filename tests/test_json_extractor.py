@@ -0,0 +1,86 @@
+"""Regression tests for the JSON extraction of LLM answers"""
+import unittest
+
+from app.utils import extract_json_from_response, extract_json_from_generate_response
+
+
+class ExtractGenerateResponseTest(unittest.TestCase):
+    def test_plain_object(self):
+        result = extract_json_from_generate_response('{"topics": [{"name": "Food", "questions": ["q1"]}]}')
+        self.assertEqual(result, {"topics": [{"name": "Food", "questions": ["q1"]}]})
+
+    def test_fenced_json(self):
+        text = '```json\n{"topics": [{"name": "Food", "questions": ["q1"]}]}\n```'
+        self.assertEqual(extract_json_from_generate_response(text), {"topics": [{"name": "Food", "questions": ["q1"]}]})
+
+    def test_fenced_json_with_prose(self):
+        text = 'Here you go:\n```json\n{"questions": ["q1", "q2"]}\n```\nGood luck!'
+        self.assertEqual(extract_json_from_generate_response(text), {"questions": ["q1", "q2"]})
+
+    def test_braces_inside_strings(self):
+        text = 'Sure! {"answers": [{"text": "I like {curly} braces"}]} Hope it helps.'
+        self.assertEqual(extract_json_from_generate_response(text), {"answers": [{"text": "I like {curly} braces"}]})
+
+    def test_nested_objects_return_outer_object(self):
+        text = 'Result: {"structures": [{"name": "a", "example": {"en": "x"}}], "note": "n"}'
+        self.assertEqual(
+            extract_json_from_generate_response(text),
+            {"structures": [{"name": "a", "example": {"en": "x"}}], "note": "n"},
+        )
+
+    def test_trailing_commas_in_nested_array(self):
+        text = '{"structures": [{"name": "a", "example": "x"},],}'
+        self.assertEqual(extract_json_from_generate_response(text), {"structures": [{"name": "a", "example": "x"}]})
+
+    def test_trailing_comma_in_outer_object(self):
+        text = 'Answer:\n{"topics": [{"name": "A", "questions": ["q1",]}], "note": "x",}'
+        self.assertEqual(
+            extract_json_from_generate_response(text),
+            {"topics": [{"name": "A", "questions": ["q1"]}], "note": "x"},
+        )
+
+    def test_multiple_vocabulary_objects_are_combined(self):
+        text = (
+            '{"word": "a", "definition": "d1", "example": "e1"}\n'
+            '{"word": "b", "definition": "d2", "example": "e2"}'
+        )
+        self.assertEqual(extract_json_from_generate_response(text), {"vocabulary": [
+            {"word": "a", "definition": "d1", "example": "e1"},
+            {"word": "b", "definition": "d2", "example": "e2"},
+        ]})
+
+    def test_several_top_level_objects_return_the_first(self):
+        # Separate objects that are not vocabulary items are not wrapped as
+        # {"items": [...]}: every caller looks up its own key, so the first
+        # object is taken as the answer and the rest is ignored
+        text = (
+            '{"topics": [{"name": "A", "questions": ["q1"]}]}\n'
+            '{"topics": [{"name": "B", "questions": ["q2"]}]}'
+        )
+        self.assertEqual(extract_json_from_generate_response(text), {"topics": [{"name": "A", "questions": ["q1"]}]})
+
+    def test_content_wrapper_is_unwrapped(self):
+        text = '{"content": "{\\"questions\\": [\\"q1\\"]}"}'
+        self.assertEqual(extract_json_from_generate_response(text), {"questions": ["q1"]})
+
+    def test_unparseable_text(self):
+        result = extract_json_from_generate_response("no json here")
+        self.assertEqual(result["content"], "no json here")
+        self.assertIn("_parse_error", result)
+
+
+class ExtractScoreResponseTest(unittest.TestCase):
+    def test_score_object_in_prose(self):
+        text = 'Score: {"bandScore": 7.0, "overallFeedback": "Good"} done'
+        self.assertEqual(extract_json_from_response(text), {"bandScore": 7.0, "overallFeedback": "Good"})
+
+    def test_regex_fallback_keeps_escaped_quotes(self):
+        text = '"bandScore": 6.5, "grammarScore": 6, "overallFeedback": "Say \\"hi\\""'
+        self.assertEqual(
+            extract_json_from_response(text),
+            {"bandScore": 6.5, "grammarScore": 6.0, "overallFeedback": 'Say "hi"'},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""Response validation of the v1 endpoints against malformed LLM answers"""
+import unittest
+
+import orjson
+from fastapi.testclient import TestClient
+from ollama import ResponseError
+
+from app.main import app
+from app.services import ollama_service
+
+
+class _FakeHTTP:
+    async def aclose(self):
+        pass
+
+
+class FakeOllamaClient:
+    """Stands in for ollama.AsyncClient and answers every chat with `answer`
+
+    A chat whose last message contains `fail_on` fails as an overloaded server.
+    """
+
+    _client = _FakeHTTP()
+
+    def __init__(self):
+        self.answer = ""
+        self.fail_on = None
+
+    async def list(self):
+        return {"models": [{"name": ollama_service.default_model}]}
+
+    async def chat(self, model="", messages=None, stream=False, format="", options=None, keep_alive=None):
+        if self.fail_on and self.fail_on in messages[-1]["content"]:
+            raise ResponseError("server overloaded", 503)
+        content = self.answer
+        if stream:
+            async def chunks():
+                yield {"message": {"content": content}, "done": False}
+                yield {"message": {"content": ""}, "done": True}
+            return chunks()
+        return {"message": {"role": "assistant", "content": content}}
+
+
+class V1ResponseValidationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fake = FakeOllamaClient()
+        cls._original_client = ollama_service.client
+        ollama_service.client = cls.fake
+        cls.client = TestClient(app)
+        cls.client.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.__exit__(None, None, None)
+        ollama_service.client = cls._original_client
+
+    def post(self, path, body, answer):
+        self.fake.answer = answer if isinstance(answer, str) else orjson.dumps(answer).decode()
+        return self.client.post(path, params={"no_cache": "true"}, json=body)
+
+    def test_topics_valid(self):
+        response = self.post("/api/generate/topics", {}, {"topics": [{"name": "Food", "questions": ["q1"]}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["topics"][0]["name"], "Food")
+
+    def test_topics_malformed_items(self):
+        response = self.post("/api/generate/topics", {}, {"topics": [{"name": None, "questions": "not a list"}]})
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("Invalid response format", response.json()["detail"])
+
+    def test_vocabulary_valid(self):
+        answer = {"vocabulary": [{"word": "w", "definition": "d", "example": "e"}]}
+        response = self.post("/api/generate/vocabulary", {"question": "q"}, answer)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["vocabulary"][0]["word"], "w")
+
+    def test_vocabulary_malformed_items(self):
+        answer = {"vocabulary": [{"word": 5, "definition": None, "example": ["x"]}]}
+        response = self.post("/api/generate/vocabulary", {"question": "q"}, answer)
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("Invalid response format", response.json()["detail"])
+
+    def test_grammar_valid(self):
+        response = self.post("/api/grammar/correct", {"transcription": "I go"}, {"original": "I go", "corrected": "I went"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["corrected"], "I went")
+
+    def test_grammar_null_original_falls_back_to_transcription(self):
+        response = self.post("/api/grammar/correct", {"transcription": "I go"}, {"original": None, "corrected": "I went"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["original"], "I go")
+        self.assertEqual(response.json()["corrected"], "I went")
+
+    def test_grammar_null_corrected(self):
+        response = self.post("/api/grammar/correct", {"transcription": "I go"}, {"original": "I go", "corrected": None})
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("Invalid response format", response.json()["detail"])
+
+    def test_improve_null_original_falls_back_to_transcription(self):
+        response = self.post("/api/improve", {"transcription": "I go"}, {"original": None, "improved": "I went"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["original"], "I go")
+
+    def test_improve_malformed_fields(self):
+        answer = {"original": "I go", "improved": 5, "vocabularySuggestions": [{"word": 1}]}
+        response = self.post("/api/improve", {"transcription": "I go"}, answer)
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("Invalid response format", response.json()["detail"])
+
+    def test_score_batch_mixed_results(self):
+        self.fake.answer = orjson.dumps({"bandScore": 7.5, "overallFeedback": "Good"}).decode()
+        self.fake.fail_on = "unlucky answer"
+        try:
+            response = self.client.post("/api/score/batch", json={"items": [
+                {"transcription": "I like apples"},
+                {"transcription": "unlucky answer"},
+            ]})
+        finally:
+            self.fake.fail_on = None
+        self.assertEqual(response.status_code, 200)
+        scored, failed = response.json()
+        self.assertEqual(scored["bandScore"], 7.5)
+        self.assertEqual(scored["overallFeedback"], "Good")
+        self.assertEqual(failed["statusCode"], 503)
+        self.assertNotIn("bandScore", failed)
+
+
+if __name__ == "__main__":
+    unittest.main()